@@ -1,22 +1,26 @@
 from datetime import datetime, timedelta
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 import secrets
 from pydantic import BaseModel
 
 from backend.app.models.token import Token, TokenResponse, RefreshRequest, RefreshToken, PasswordResetRequest, PasswordReset
+from backend.app.models.token import IntrospectionRequest, IntrospectionResponse
 from backend.app.models.user import User, UserResponse
 from backend.app.core.config import settings
-from backend.app.core.security import (
-    create_access_token,
-    verify_password,
-    get_password_hash,
-)
+from backend.app.core.security import create_access_token
+from backend.app.core.etags import etag_headers, etag_matches, not_modified, user_etag
+from backend.app.core.serialization import FastJSONResponse
+from backend.app.services.principal_cache import Principal
 from backend.app.core.dependencies import get_current_active_user
-from backend.app.db.database import get_db
+from backend.app.db.database import get_db, tenant_router
 from backend.app.providers.auth_provider import AuthProvider
+from backend.app.services.introspection import introspect_tokens
+from backend.app.services.login_throttle import LoginThrottled, login_throttle
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -24,16 +28,39 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 class LoginRequest(BaseModel):
     username: str
     password: str
+    tenant: Optional[str] = None  # Skips searching every shard for the username
+
+def _client_ip(request: Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
+def _too_many_attempts(e: LoginThrottled) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many attempts, retry later",
+        headers={"Retry-After": str(max(math.ceil(e.retry_after), 1))},
+    )
+
+async def _check_login_throttle(request: Request, username: str) -> None:
+    """
+    Reject the attempt before any lookup or bcrypt work when over a limit
+    """
+    try:
+        await login_throttle.check_login(username, _client_ip(request))
+    except LoginThrottled as e:
+        raise _too_many_attempts(e)
 
 @router.post("/login", response_model=TokenResponse)
 async def login_json(
         login_data: LoginRequest,
-        db: Session = Depends(get_db),
+        request: Request,
 ) -> Any:
     """
     Login with username and password (JSON)
     """
-    user = AuthProvider.authenticate_user(db, login_data.username, login_data.password)
+    await _check_login_throttle(request, login_data.username)
+    user = await AuthProvider.authenticate_user(
+        login_data.username, login_data.password, login_data.tenant
+    )
 
     if not user:
         raise HTTPException(
@@ -42,18 +69,19 @@ async def login_json(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    tokens = AuthProvider.create_tokens(db, user)
+    tokens = await AuthProvider.create_tokens(user)
     return tokens
 
 @router.post("/token", response_model=TokenResponse)
 async def login_form(
+        request: Request,
         form_data: OAuth2PasswordRequestForm = Depends(),
-        db: Session = Depends(get_db),
 ) -> Any:
     """
     OAuth2 compatible token login with form data
     """
-    user = AuthProvider.authenticate_user(db, form_data.username, form_data.password)
+    await _check_login_throttle(request, form_data.username)
+    user = await AuthProvider.authenticate_user(form_data.username, form_data.password)
 
     if not user:
         raise HTTPException(
@@ -62,18 +90,23 @@ async def login_form(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    tokens = AuthProvider.create_tokens(db, user)
+    tokens = await AuthProvider.create_tokens(user)
     return tokens
 
 @router.post("/refresh", response_model=TokenResponse)
 async def refresh_token(
         refresh_request: RefreshRequest,
-        db: Session = Depends(get_db),
+        request: Request,
 ) -> Any:
     """
     Get a new access token using a refresh token
     """
-    tokens = AuthProvider.refresh_tokens(db, refresh_request.refresh_token)
+    try:
+        await login_throttle.check_refresh(_client_ip(request))
+    except LoginThrottled as e:
+        raise _too_many_attempts(e)
+
+    tokens = await AuthProvider.refresh_tokens(refresh_request.refresh_token)
 
     if not tokens:
         raise HTTPException(
@@ -87,13 +120,16 @@ async def refresh_token(
 @router.post("/logout", status_code=status.HTTP_200_OK)
 async def logout(
         refresh_request: RefreshRequest,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_active_user),
+        current_user: Principal = Depends(get_current_active_user),
 ) -> Any:
     """
     Logout the user by revoking the refresh token
+
+    Only the token store is touched, not the user's database.
     """
-    success = AuthProvider.revoke_token(db, refresh_request.refresh_token, current_user.id)
+    success = await AuthProvider.revoke_token(
+        refresh_request.refresh_token, current_user.tenant, current_user.id
+    )
 
     if not success:
         raise HTTPException(
@@ -103,19 +139,73 @@ async def logout(
 
     return {"detail": "Successfully logged out"}
 
+@router.post("/logout-all", status_code=status.HTTP_200_OK)
+async def logout_all(
+        db: AsyncSession = Depends(get_db),
+        current_user: Principal = Depends(get_current_active_user),
+) -> Any:
+    """
+    Logout the user everywhere by revoking all of their tokens
+    """
+    await AuthProvider.revoke_all_tokens(db, current_user.tenant, current_user.id)
+
+    return {"detail": "Successfully logged out from all sessions"}
+
 @router.get("/me", response_model=UserResponse)
 async def read_users_me(
-        current_user: User = Depends(get_current_active_user),
+        request: Request,
+        current_user: Principal = Depends(get_current_active_user),
 ) -> Any:
     """
     Get current user information
+
+    Answers a matching If-None-Match with 304 Not Modified.
     """
-    return UserResponse.from_orm(current_user)
+    etag = user_etag(current_user.tenant, current_user.id, current_user.updated_at)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # Built from the cached principal without validating it again
+    return FastJSONResponse(UserResponse.dict_from_orm(current_user), headers=etag_headers(etag))
+
+def _check_introspection_client(request: Request) -> None:
+    """
+    Require the introspection secret as bearer token when one is configured
+    """
+    expected = settings.INTROSPECTION_CLIENT_SECRET
+    if not expected:
+        return
+    auth_header = request.headers.get("authorization", "")
+    if not secrets.compare_digest(auth_header.encode(), f"Bearer {expected}".encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid introspection client credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+@router.post("/introspect", response_model=IntrospectionResponse, response_model_exclude_none=True)
+async def introspect(
+        introspection_request: IntrospectionRequest,
+        request: Request,
+) -> Any:
+    """
+    Check a batch of access tokens for API gateways
+
+    Each result says whether the token is active and, if so, carries its
+    claims with the user's current roles and how long it may be cached.
+    """
+    _check_introspection_client(request)
+    if len(introspection_request.tokens) > settings.INTROSPECTION_MAX_TOKENS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.INTROSPECTION_MAX_TOKENS} tokens per request",
+        )
+
+    return {"results": await introspect_tokens(introspection_request.tokens)}
 
 @router.post("/password-reset-request", status_code=status.HTTP_200_OK)
 async def request_password_reset(
         reset_request: PasswordResetRequest,
-        db: Session = Depends(get_db),
 ) -> Any:
     """
     Request a password reset token
@@ -123,7 +213,9 @@ async def request_password_reset(
     In a real application, this would send an email with a reset link.
     For this example, we'll just return the token in the response.
     """
-    user = db.exec(select(User).where(User.email == reset_request.email)).first()
+    # Emails are unique across shards, so at most one row comes back
+    users = await tenant_router.scatter(select(User).where(User.email == reset_request.email))
+    user = users[0] if users else None
 
     # Always return success, even if user doesn't exist (security best practice)
     if not user:
@@ -142,7 +234,6 @@ async def request_password_reset(
 @router.post("/password-reset", status_code=status.HTTP_200_OK)
 async def reset_password(
         reset_data: PasswordReset,
-        db: Session = Depends(get_db),
 ) -> Any:
     """
     Reset password using token
@@ -0,0 +1,25 @@
+import json
+from typing import Any
+from fastapi import APIRouter, Request, Response
+
+from backend.app.core.config import settings
+from backend.app.core.etags import etag_headers, etag_matches, make_etag, not_modified
+from backend.app.core.security import key_ring
+
+router = APIRouter(tags=["authentication"])
+
+@router.get("/.well-known/jwks.json")
+async def read_jwks(request: Request) -> Any:
+    """
+    Public keys for verifying access tokens offline (JWK Set)
+
+    Verifiers should cache the set for the advertised max-age and refetch it
+    when a token names an unknown `kid`. Upcoming keys are listed before they
+    sign anything, so a cached set is never missing the current key.
+    """
+    body = json.dumps(key_ring.jwks(), separators=(",", ":"), sort_keys=True).encode()
+    etag = make_etag("jwks", body.decode())
+    cache_control = f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}"
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    return Response(content=body, media_type="application/json", headers=etag_headers(etag, cache_control))
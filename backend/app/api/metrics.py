@@ -0,0 +1,99 @@
+import time
+from typing import Any, Iterable, Optional
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from backend.app.core.config import settings
+from backend.app.core.metrics import Sample, metrics
+from backend.app.core.security import token_cache
+from backend.app.db.database import tenant_router
+from backend.app.providers.token_store import token_store
+from backend.app.services.hashing import password_hasher
+from backend.app.services.principal_cache import principal_cache
+
+router = APIRouter(tags=["monitoring"])
+
+# Content type of the Prometheus text exposition format (charset is appended)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+class _TokenCount:
+    """
+    Refresh token count, re-read at most once per interval
+    """
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self.value: Optional[int] = None
+        self._read_at = float("-inf")
+
+    async def refresh(self) -> None:
+        if time.monotonic() - self._read_at < self.interval_seconds:
+            return
+        self._read_at = time.monotonic()
+        self.value = await token_store.count()
+
+_token_count = _TokenCount(settings.METRICS_TOKEN_COUNT_INTERVAL_SECONDS)
+
+def _pools() -> Iterable[Any]:
+    # (shard, database, pool) of every primary and replica
+    for name, shard in tenant_router.shards.items():
+        yield name, "primary", shard.engine.sync_engine.pool
+        for index, replica in enumerate(shard.read.replicas):
+            yield name, f"replica-{index}", replica.engine.sync_engine.pool
+
+def _pool_samples(attribute: str) -> Iterable[Sample]:
+    for shard, database, pool in _pools():
+        checkout_stats = getattr(pool, "checkout_stats", None)
+        if checkout_stats is not None:
+            yield {"shard": shard, "database": database}, getattr(checkout_stats, attribute)
+
+def _checked_out() -> Iterable[Sample]:
+    for shard, database, pool in _pools():
+        if hasattr(pool, "checkedout"):
+            yield {"shard": shard, "database": database}, pool.checkedout()
+
+def _token_rows() -> Iterable[Sample]:
+    if _token_count.value is not None:
+        yield {}, _token_count.value
+
+def _cache_samples(key: str) -> Iterable[Sample]:
+    yield {"cache": "token"}, token_cache.stats()[key]
+    yield {"cache": "principal"}, principal_cache.stats()[key]
+
+metrics.callback(
+    "db_pool_checkouts_total", "Connections checked out of each pool", "counter",
+    lambda: _pool_samples("count"),
+)
+metrics.callback(
+    "db_pool_checkout_wait_seconds_total", "Time spent waiting for pooled connections", "counter",
+    lambda: _pool_samples("wait_seconds"),
+)
+metrics.callback(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up waiting for a connection", "counter",
+    lambda: _pool_samples("timeouts"),
+)
+metrics.callback(
+    "db_pool_connections_checked_out", "Connections currently in use", "gauge", _checked_out,
+)
+metrics.callback(
+    "refresh_tokens", "Rows in the refresh token store, including ones awaiting purge", "gauge",
+    _token_rows,
+)
+metrics.callback(
+    "password_hash_queue_depth", "bcrypt jobs waiting for a hashing worker", "gauge",
+    lambda: [({}, password_hasher.stats()["queue_depth"])],
+)
+metrics.callback(
+    "cache_hits_total", "Cache hits by cache", "counter", lambda: _cache_samples("hits"),
+)
+metrics.callback(
+    "cache_misses_total", "Cache misses by cache", "counter", lambda: _cache_samples("misses"),
+)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics() -> Any:
+    """
+    Metrics of this worker process in the Prometheus text format
+    """
+    await _token_count.refresh()
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
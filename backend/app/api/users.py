@@ -1,63 +1,158 @@
 from datetime import datetime
-from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-
-from backend.app.models.user import User, UserCreate, UserUpdate, UserResponse
-from backend.app.core.security import get_password_hash
-from backend.app.db.database import get_db
+from typing import Any, AsyncIterator, List, Optional
+import base64
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.app.models.user import (
+    User, UserCreate, UserUpdate, UserResponse, UserPage, BulkUserReport,
+    BulkUserSelection, BulkRolesUpdate, BulkDisableUpdate, BulkMutationResult,
+)
+from backend.app.core.config import settings
+from backend.app.core.etags import etag_headers, etag_matches, make_etag, not_modified, user_etag
+from backend.app.core.serialization import FastJSONResponse, dumps
+from backend.app.core.roles import ROLE_ADMIN, UnknownRoleError, roles_to_mask
+from backend.app.db.database import get_db, get_read_db, tenant_router
+from backend.app.services.hashing import password_hasher
+from backend.app.services.principal_cache import Principal, principal_cache
+from backend.app.services.tenant_version import bump_tenant_version, get_tenant_version
+from backend.app.services.user_import import UserImporter
+from backend.app.services.user_bulk import bulk_delete_users, bulk_update_users, selection_condition
 from backend.app.core.dependencies import get_current_active_superuser, get_current_active_user, check_roles
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-@router.get("/", response_model=List[UserResponse])
+# Rows fetched per round trip by the NDJSON export
+EXPORT_CHUNK_SIZE = 1000
+
+# Columns behind UserResponse; reads that only serialize users select these
+# rather than ORM entities, which skips the identity map and hashed_password
+USER_RESPONSE_COLUMNS = (
+    User.id, User.username, User.email, User.full_name, User.disabled,
+    User.tenant, User.role_mask, User.created_at, User.updated_at,
+)
+
+def _encode_cursor(tenant: str, last_id: int) -> str:
+    """
+    Opaque cursor pointing after the given user
+    """
+    raw = json.dumps([tenant, last_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, tenant: str) -> int:
+    """
+    Return the last seen user id, rejecting cursors from other tenants
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_tenant, last_id = json.loads(raw)
+        if cursor_tenant != tenant or not isinstance(last_id, int):
+            raise ValueError(cursor)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+    return last_id
+
+@router.get("/", response_model=UserPage)
 async def read_users(
-        db: Session = Depends(get_db),
-        skip: int = 0,
-        limit: int = 100,
-        current_user: User = Depends(check_roles(["ADMIN"])),
+        request: Request,
+        db: AsyncSession = Depends(get_read_db),
+        cursor: Optional[str] = None,
+        limit: int = Query(100, ge=1, le=1000),
+        current_user: Principal = Depends(check_roles(["ADMIN"])),
 ) -> Any:
     """
     Retrieve users (admin only)
+
+    Pages are walked with keyset pagination on (tenant, id): pass the
+    returned `next_cursor` to get the following page. Pages carry an ETag
+    from the tenant's user version, so a matching If-None-Match is answered
+    with 304 Not Modified without reading any user.
     """
     # Filter users by tenant for multi-tenant support
-    users = db.exec(
-        select(User)
-        .where(User.tenant == current_user.tenant)
-        .offset(skip)
-        .limit(limit)
-    ).all()
+    query = select(*USER_RESPONSE_COLUMNS).where(User.tenant == current_user.tenant)
+    if cursor:
+        query = query.where(User.id > _decode_cursor(cursor, current_user.tenant))
+
+    # Read before the users, so the ETag can only be older than the page
+    version = await get_tenant_version(db, current_user.tenant)
+    etag = make_etag("users", current_user.tenant, version, cursor or "", limit)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # Fetch one extra row to know whether another page exists
+    users = (await db.exec(query.order_by(User.id).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = _encode_cursor(current_user.tenant, users[-1].id)
+
+    # Serialized straight from the rows, without building UserResponse models
+    return FastJSONResponse(
+        {
+            "items": [UserResponse.dict_from_orm(user) for user in users],
+            "next_cursor": next_cursor,
+        },
+        headers=etag_headers(etag),
+    )
 
-    return [UserResponse.from_orm(user) for user in users]
+async def _export_users(tenant: str, user_id: int) -> AsyncIterator[bytes]:
+    """
+    Stream a tenant's users as NDJSON chunks from a server-side cursor
+    """
+    # The session is owned by the stream, which outlives the request handler
+    shard = await tenant_router.shard_for(tenant)
+    async with await shard.read.open_session((tenant, user_id)) as db:
+        result = await db.stream(
+            # Columns rather than ORM entities, so rows never pile up in the identity map
+            select(*USER_RESPONSE_COLUMNS)
+            .where(User.tenant == tenant)
+            .order_by(User.id)
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        async for rows in result.partitions(EXPORT_CHUNK_SIZE):
+            yield b"".join(dumps(UserResponse.dict_from_orm(row)) + b"\n" for row in rows)
+
+@router.get("/export")
+async def export_users(
+        current_user: Principal = Depends(check_roles(["ADMIN"])),
+) -> StreamingResponse:
+    """
+    Export all users of the tenant as NDJSON (admin only)
+    """
+    return StreamingResponse(
+        _export_users(current_user.tenant, current_user.id),
+        media_type="application/x-ndjson",
+    )
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
         user_in: UserCreate,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(check_roles(["ADMIN"])),
+        db: AsyncSession = Depends(get_db),
+        current_user: Principal = Depends(check_roles(["ADMIN"])),
 ) -> Any:
     """
     Create new user (admin only)
     """
-    # Check if username exists in the same tenant
-    user = db.exec(
-        select(User)
-        .where(User.username == user_in.username, User.tenant == current_user.tenant)
-    ).first()
-
-    if user:
+    # Usernames and emails are unique across tenants, and so across shards;
+    # both are checked in one round trip per shard
+    taken = await tenant_router.scatter(
+        select(User.username, User.email)
+        .where(or_(User.username == user_in.username, User.email == user_in.email))
+    )
+    if any(username == user_in.username for username, _ in taken):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered",
         )
 
-    # Check if email exists in the same tenant
-    user = db.exec(
-        select(User)
-        .where(User.email == user_in.email, User.tenant == current_user.tenant)
-    ).first()
-
-    if user:
+    if taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered",
@@ -65,38 +160,177 @@ async def create_user(
 
     # Create user with current user's tenant
     db_user = User(
-        **user_in.dict(exclude={"password"}),
-        hashed_password=get_password_hash(user_in.password),
+        **user_in.dict(exclude={"password", "tenant"}),
+        hashed_password=await password_hasher.hash(user_in.password),
         tenant=current_user.tenant
     )
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await bump_tenant_version(db, current_user.tenant)
+    await db.commit()
+    await db.refresh(db_user)
 
     return UserResponse.from_orm(db_user)
 
+async def _read_bulk_rows(request: Request) -> AsyncIterator[Any]:
+    """
+    Yield rows from a JSON array body or, incrementally, from an NDJSON stream
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(("application/x-ndjson", "application/jsonl")):
+        buffer = b""
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_ndjson_line(line)
+        if buffer.strip():
+            yield _parse_ndjson_line(buffer)
+        return
+
+    try:
+        rows = json.loads(await request.body())
+    except ValueError:
+        rows = None
+
+    if not isinstance(rows, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a JSON array of users or an NDJSON stream",
+        )
+
+    for row in rows:
+        yield row
+
+def _parse_ndjson_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        # Reported as an invalid row rather than failing the whole import
+        return None
+
+@router.post("/bulk", response_model=BulkUserReport)
+async def bulk_create_users(
+        request: Request,
+        db: AsyncSession = Depends(get_db),
+        current_user: Principal = Depends(check_roles(["ADMIN"])),
+) -> Any:
+    """
+    Create users in bulk (admin only)
+
+    Accepts a JSON array of users or an `application/x-ndjson` stream with
+    one user per line, and returns a result for every row.
+    """
+    importer = UserImporter(db, current_user.tenant, chunk_size=settings.USER_BULK_CHUNK_SIZE)
+    return await importer.run(_read_bulk_rows(request))
+
+def _parse_roles(roles: List[str]) -> int:
+    """
+    Role bitmask for names sent by a client
+    """
+    try:
+        return roles_to_mask(roles)
+    except UnknownRoleError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+def _check_selection(selection: BulkUserSelection) -> None:
+    # An empty body must not silently target the whole tenant
+    if selection.ids is None and selection.filter is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide user ids, a filter, or both",
+        )
+
+    if selection.filter is not None and selection.filter.role is not None:
+        _parse_roles([selection.filter.role])
+
+@router.post("/bulk/roles", response_model=BulkMutationResult)
+async def bulk_update_roles(
+        update_in: BulkRolesUpdate,
+        db: AsyncSession = Depends(get_db),
+        current_user: Principal = Depends(check_roles(["ADMIN"])),
+) -> Any:
+    """
+    Assign a role set to many users and revoke their tokens (admin only)
+    """
+    _check_selection(update_in)
+    role_mask = _parse_roles(update_in.roles)
+    condition = selection_condition(update_in, current_user.tenant, current_user.id)
+    ids = await bulk_update_users(db, current_user.tenant, condition, {"role_mask": role_mask})
+
+    return BulkMutationResult(affected=len(ids), ids=ids)
+
+@router.post("/bulk/disable", response_model=BulkMutationResult)
+async def bulk_disable_users(
+        update_in: BulkDisableUpdate,
+        db: AsyncSession = Depends(get_db),
+        current_user: Principal = Depends(check_roles(["ADMIN"])),
+) -> Any:
+    """
+    Disable (or re-enable) many users and revoke their tokens (admin only)
+    """
+    _check_selection(update_in)
+    condition = selection_condition(update_in, current_user.tenant, current_user.id)
+    ids = await bulk_update_users(
+        db, current_user.tenant, condition, {"disabled": update_in.disabled}
+    )
+
+    return BulkMutationResult(affected=len(ids), ids=ids)
+
+@router.post("/bulk/delete", response_model=BulkMutationResult)
+async def bulk_delete(
+        selection: BulkUserSelection,
+        db: AsyncSession = Depends(get_db),
+        current_user: Principal = Depends(check_roles(["ADMIN"])),
+) -> Any:
+    """
+    Delete many users and revoke their tokens (admin only)
+    """
+    _check_selection(selection)
+    condition = selection_condition(selection, current_user.tenant, current_user.id)
+    ids = await bulk_delete_users(db, current_user.tenant, condition)
+
+    return BulkMutationResult(affected=len(ids), ids=ids)
+
 @router.get("/{user_id}", response_model=UserResponse)
 async def read_user(
         user_id: int,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_active_user),
+        request: Request,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: Principal = Depends(get_current_active_user),
 ) -> Any:
     """
     Get a specific user by id
+
+    Answers a matching If-None-Match with 304 Not Modified, checking only
+    the user's updated_at.
     """
     # Users can only see their own profile unless they're an admin
-    if current_user.id != user_id and "ADMIN" not in current_user.roles.split(","):
+    if current_user.id != user_id and not current_user.role_mask & ROLE_ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions",
         )
 
+    if request.headers.get("if-none-match"):
+        updated_at = (await db.exec(
+            select(User.updated_at)
+            .where(User.id == user_id, User.tenant == current_user.tenant)
+        )).first()
+        if updated_at is not None:
+            etag = user_etag(current_user.tenant, user_id, updated_at)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+
     # Get user and verify tenant for multi-tenant security
-    user = db.exec(
-        select(User)
+    user = (await db.exec(
+        select(*USER_RESPONSE_COLUMNS)
         .where(User.id == user_id, User.tenant == current_user.tenant)
-    ).first()
+    )).first()
 
     if not user:
         raise HTTPException(
@@ -104,30 +338,33 @@ async def read_user(
             detail="User not found",
         )
 
-    return UserResponse.from_orm(user)
+    return FastJSONResponse(
+        UserResponse.dict_from_orm(user),
+        headers=etag_headers(user_etag(user.tenant, user.id, user.updated_at)),
+    )
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
         user_id: int,
         user_in: UserUpdate,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_db),
+        current_user: Principal = Depends(get_current_active_user),
 ) -> Any:
     """
     Update a user
     """
     # Users can only update their own profile unless they're an admin
-    if current_user.id != user_id and "ADMIN" not in current_user.roles.split(","):
+    if current_user.id != user_id and not current_user.role_mask & ROLE_ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions",
         )
 
     # Get user and verify tenant
-    user = db.exec(
+    user = (await db.exec(
         select(User)
         .where(User.id == user_id, User.tenant == current_user.tenant)
-    ).first()
+    )).first()
 
     if not user:
         raise HTTPException(
@@ -140,7 +377,7 @@ async def update_user(
 
     # Hash the password if it's being updated
     if "password" in update_data:
-        update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
+        update_data["hashed_password"] = await password_hasher.hash(update_data.pop("password"))
 
     for field, value in update_data.items():
         setattr(user, field, value)
@@ -149,25 +386,30 @@ async def update_user(
     user.updated_at = datetime.utcnow()
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
-
-    return UserResponse.from_orm(user)
+    await bump_tenant_version(db, user.tenant)
+    await db.commit()
+    await db.refresh(user)
+    await principal_cache.invalidate(user.tenant, user.id)
+
+    return FastJSONResponse(
+        UserResponse.dict_from_orm(user),
+        headers=etag_headers(user_etag(user.tenant, user.id, user.updated_at)),
+    )
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
         user_id: int,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(check_roles(["ADMIN"])),
+        db: AsyncSession = Depends(get_db),
+        current_user: Principal = Depends(check_roles(["ADMIN"])),
 ) -> None:
     """
     Delete a user (admin only)
     """
     # Get user and verify tenant
-    user = db.exec(
+    user = (await db.exec(
         select(User)
         .where(User.id == user_id, User.tenant == current_user.tenant)
-    ).first()
+    )).first()
 
     if not user:
         raise HTTPException(
@@ -182,24 +424,28 @@ async def delete_user(
             detail="Cannot delete your own user account",
         )
 
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await bump_tenant_version(db, current_user.tenant)
+    await db.commit()
+    await principal_cache.invalidate(current_user.tenant, user_id)
 
 @router.put("/{user_id}/roles", response_model=UserResponse)
 async def update_user_roles(
         user_id: int,
         roles: List[str],
-        db: Session = Depends(get_db),
-        current_user: User = Depends(check_roles(["ADMIN"])),
+        db: AsyncSession = Depends(get_db),
+        current_user: Principal = Depends(check_roles(["ADMIN"])),
 ) -> Any:
     """
     Update user roles (admin only)
     """
+    role_mask = _parse_roles(roles)
+
     # Get user and verify tenant
-    user = db.exec(
+    user = (await db.exec(
         select(User)
         .where(User.id == user_id, User.tenant == current_user.tenant)
-    ).first()
+    )).first()
 
     if not user:
         raise HTTPException(
@@ -208,11 +454,13 @@ async def update_user_roles(
         )
 
     # Update roles
-    user.roles = ",".join(roles)
+    user.role_mask = role_mask
     user.updated_at = datetime.utcnow()
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await bump_tenant_version(db, user.tenant)
+    await db.commit()
+    await db.refresh(user)
+    await principal_cache.invalidate(user.tenant, user.id)
 
     return UserResponse.from_orm(user)
\ No newline at end of file
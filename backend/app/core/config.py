@@ -1,24 +1,138 @@
-from typing import List, Optional
-import secrets
+from pathlib import Path
+from typing import Dict, List, Optional
 from pydantic import BaseSettings
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Files the service creates for itself (ignored by git)
+INSTANCE_DIR = Path(__file__).resolve().parents[2] / "instance"
+
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Project API"
+    # Adds diagnostics meant for developers, e.g. Server-Timing headers
+    DEBUG: bool = False
 
     # Security
-    SECRET_KEY: str = secrets.token_urlsafe(32)
+    # Every worker and node must share SECRET_KEY (or the keys below). Unset,
+    # a secret generated once per host is kept in SECRET_KEY_FILE, which
+    # only the workers of that host share
+    SECRET_KEY: Optional[str] = None
+    SECRET_KEY_FILE: str = str(INSTANCE_DIR / "secret_key")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+
+    # Signing key ring (see backend.app.core.keys): a keys file, or its JSON
+    # contents e.g. from a secret store; without either tokens are signed with
+    # SECRET_KEY/ALGORITHM. The keys file is checked for changes every reload
+    # interval (0 disables). Retired keys keep verifying for the
+    # overlap (default: the access token lifetime), upcoming keys are
+    # published in the JWKS ahead of activation, and the JWKS may be cached
+    JWT_KEYS_FILE: Optional[str] = None
+    JWT_KEYS: Optional[str] = None
+    JWT_KEYS_RELOAD_SECONDS: float = 10
+    JWT_KEY_OVERLAP_SECONDS: Optional[int] = None
+    JWT_KEY_PREPUBLISH_SECONDS: int = 86400
+    JWKS_MAX_AGE_SECONDS: int = 300
+    # "fast" signs and verifies HS tokens without python-jose's generic path;
+    # "jose" uses python-jose for everything
+    JWT_CODEC: str = "fast"
+
+    # Batch token introspection for API gateways: tokens per call, how long
+    # a result may be reused (capped at the token's exp) and, when set, the
+    # bearer secret callers must present
+    INTROSPECTION_MAX_TOKENS: int = 100
+    INTROSPECTION_CACHE_SECONDS: int = 60
+    INTROSPECTION_CLIENT_SECRET: Optional[str] = None
+
+    # Role registry; each role's position is its bit in User.role_mask and the
+    # token's "rm" claim, so only ever append to this list
+    ROLES: List[str] = ["USER", "ADMIN"]
+
+    # Refresh token storage: "sql", "memory" or "redis"
+    TOKEN_STORE_BACKEND: str = "sql"
+    TOKEN_STORE_REDIS_URL: Optional[str] = None
+
+    # Background deletion of expired/revoked refresh tokens (interval 0 disables).
+    # Every worker runs it unless disabled, so turn it off on all but one
+    REFRESH_TOKEN_PURGE_ENABLED: bool = True
+    REFRESH_TOKEN_PURGE_INTERVAL_SECONDS: int = 3600
+    REFRESH_TOKEN_PURGE_BATCH_SIZE: int = 1000
+    REFRESH_TOKEN_PURGE_BATCH_PAUSE_SECONDS: float = 0.1
+
+    # Throttling of login and refresh attempts, checked before any lookup or
+    # bcrypt work: at most N attempts per username / client address in any
+    # window. Counters are per worker unless the Redis URL is set
+    LOGIN_THROTTLE_ENABLED: bool = True
+    LOGIN_THROTTLE_WINDOW_SECONDS: float = 60
+    LOGIN_THROTTLE_USERNAME_ATTEMPTS: int = 10
+    LOGIN_THROTTLE_IP_ATTEMPTS: int = 30
+    REFRESH_THROTTLE_IP_ATTEMPTS: int = 120
+    LOGIN_THROTTLE_SHARDS: int = 16
+    LOGIN_THROTTLE_MAX_KEYS: int = 100000
+    LOGIN_THROTTLE_REDIS_URL: Optional[str] = None
+
+    # Password hashing pool ("thread" or "process"); sizes default to the CPU count
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+    PASSWORD_HASH_MAX_CONCURRENCY: Optional[int] = None
+
+    # Principal cache used by get_current_user; the Redis URL enables
+    # cross-worker invalidation
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    PRINCIPAL_CACHE_REDIS_URL: Optional[str] = None
+
+    # Prometheus metrics at /metrics (per worker process); counting refresh
+    # tokens needs a table scan, so the count is reused for the given interval
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN_COUNT_INTERVAL_SECONDS: int = 60
+
+    # Rows per transaction for bulk user imports
+    USER_BULK_CHUNK_SIZE: int = 1000
 
     # Database
     DATABASE_URL: str = "sqlite:///./project.db"
 
+    # Query profiling: statements slower than the threshold are logged with
+    # their route, as are statements a request runs at least the repeat
+    # threshold times (likely N+1 loops); 0 disables either check
+    DATABASE_SLOW_QUERY_MS: int = 200
+    DATABASE_REPEATED_QUERY_THRESHOLD: int = 5
+
+    # Engine profile: "default" (driver defaults), "sqlite-production" (WAL and
+    # a connection pool for a SQLite file) or "server" (client-server databases)
+    DATABASE_ENGINE_PROFILE: str = "default"
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 30
+    DATABASE_POOL_RECYCLE_SECONDS: int = 1800
+    DATABASE_POOL_PRE_PING: bool = True
+
+    # Read replicas for GET routes and auth lookups (none: reads use the primary).
+    # A replica that fails is skipped for the retry period, and clients read from
+    # the primary for a while after writing
+    DATABASE_READ_REPLICA_URLS: List[str] = []
+    DATABASE_REPLICA_RETRY_SECONDS: float = 30
+    DATABASE_READ_YOUR_WRITES_SECONDS: float = 5
+
+    # Tenant sharding: extra shard name -> database URL (DATABASE_URL is the
+    # "default" shard). New tenants are pinned by TENANT_SHARD_MAP or placed by
+    # consistent hashing; workers reload placements at the refresh interval
+    DATABASE_SHARDS: Dict[str, str] = {}
+    DATABASE_SHARD_REPLICA_URLS: Dict[str, List[str]] = {}
+    TENANT_SHARD_MAP: Dict[str, str] = {}
+    TENANT_PLACEMENT_REFRESH_SECONDS: float = 30
+
+    # Pragmas applied by the sqlite-production profile (negative cache_size is KiB)
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE: int = -64000
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = [
         "http://localhost:4200",  # Angular frontend
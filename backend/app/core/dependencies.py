@@ -1,28 +1,28 @@
-from typing import Generator, List, Optional
-from fastapi import Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import JWTError
 from pydantic import ValidationError
-from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from backend.app.db.database import get_db
-from backend.app.models.token import TokenPayload
-from backend.app.models.user import User
+from backend.app.db.database import get_read_db
 from backend.app.core.config import settings
-from backend.app.core.security import verify_token
+from backend.app.core.roles import ROLE_ADMIN, roles_to_mask
+from backend.app.core.security import decode_access_token
+from backend.app.services.principal_cache import Principal, principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
 async def get_current_user(
-        db: Session = Depends(get_db),
+        request: Request,
+        db: AsyncSession = Depends(get_read_db),
         token: str = Depends(oauth2_scheme),
-) -> User:
+) -> Principal:
     """
     Validate access token and return current user
     """
     try:
-        payload = verify_token(token)
-        token_data = TokenPayload(**payload)
+        token_data = decode_access_token(token)
     except (JWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -30,18 +30,31 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.exec(select(User).where(User.id == int(token_data.sub))).first()
-    if not user:
+    # Share the verified payload with the token refresh middleware
+    request.state.token_payload = token_data
+    user_id = int(token_data.sub)
+
+    # Served from the principal cache; only a miss touches the database
+    principal = await principal_cache.load(db, token_data.tid, user_id)
+    if not principal:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
 
-    return user
+    # Tokens issued before the last "log out everywhere" are rejected
+    if token_data.ver != principal.token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return principal
 
 async def get_current_active_user(
-        current_user: User = Depends(get_current_user),
-) -> User:
+        current_user: Principal = Depends(get_current_user),
+) -> Principal:
     """
     Verify that the current user is active
     """
@@ -53,12 +66,12 @@ async def get_current_active_user(
     return current_user
 
 def get_current_active_superuser(
-        current_user: User = Depends(get_current_active_user),
-) -> User:
+        current_user: Principal = Depends(get_current_active_user),
+) -> Principal:
     """
     Verify that the current user is a superuser
     """
-    if "ADMIN" not in current_user.roles.split(","):
+    if not current_user.role_mask & ROLE_ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="The user doesn't have enough privileges"
@@ -69,14 +82,14 @@ def check_roles(required_roles: List[str]):
     """
     Dependency factory to check if the current user has any of the required roles
     """
-    async def _check_roles(
-            current_user: User = Depends(get_current_active_user),
-    ) -> User:
-        user_roles = current_user.roles.split(",") if current_user.roles else []
+    # Resolved once when the route is declared; unknown names fail at import
+    required_mask = roles_to_mask(required_roles)
 
-        for role in required_roles:
-            if role in user_roles:
-                return current_user
+    async def _check_roles(
+            current_user: Principal = Depends(get_current_active_user),
+    ) -> Principal:
+        if current_user.role_mask & required_mask:
+            return current_user
 
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,44 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response, status
+
+# Responses are per user and must be revalidated before every reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Strong ETag identifying one representation by the values it derives from
+    """
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def user_etag(tenant: str, user_id: int, updated_at: datetime) -> str:
+    """
+    ETag of a user's representation; every change to it sets updated_at
+    """
+    return make_etag("user", tenant, user_id, updated_at.isoformat())
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Whether the request's If-None-Match lists the ETag (weak comparison)
+    """
+    header: Optional[str] = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag for candidate in candidates
+    )
+
+
+def etag_headers(etag: str, cache_control: str = CACHE_CONTROL) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(etag: str, cache_control: str = CACHE_CONTROL) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag, cache_control))
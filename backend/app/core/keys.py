@@ -0,0 +1,491 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import secrets
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+
+from backend.app.core.token_codec import TokenCodec, create_codec
+
+logger = logging.getLogger(__name__)
+
+SYMMETRIC_ALGORITHMS = ("HS256", "HS384", "HS512")
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+
+# Least time between source checks triggered by tokens naming an unknown key
+UNKNOWN_KEY_RELOAD_SECONDS = 1.0
+
+
+@dataclass
+class SigningKey:
+    """
+    One key of the ring and the period it signs tokens in
+
+    The key signs from `activates_at` until `retires_at` and keeps verifying
+    for the ring's overlap period after that, so tokens it issued stay
+    valid until they expire. Asymmetric keys are published in the JWKS;
+    symmetric ones never leave the service.
+    """
+    kid: Optional[str]
+    algorithm: str
+    key: Key
+    activates_at: Optional[datetime] = None
+    retires_at: Optional[datetime] = None
+    # Key that checks signatures: the public half of an asymmetric key
+    verifier: Key = field(init=False, repr=False)
+    # Set by the key ring, which picks the codec backend
+    codec: TokenCodec = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.verifier = self.key if self.symmetric else self.key.public_key()
+        self.use_codec("fast")
+
+    def use_codec(self, backend: str) -> None:
+        headers = {"kid": self.kid} if self.kid else {}
+        self.codec = create_codec(self.algorithm, self.key, self.verifier, headers, backend)
+
+    @property
+    def symmetric(self) -> bool:
+        return self.algorithm in SYMMETRIC_ALGORITHMS
+
+    def signs_at(self, now: datetime) -> bool:
+        return (
+            (self.activates_at is None or self.activates_at <= now)
+            and (self.retires_at is None or now < self.retires_at)
+        )
+
+    def public_jwk(self) -> Dict[str, Any]:
+        return {**self.verifier.to_dict(), "kid": self.kid, "use": "sig"}
+
+
+class KeyRing:
+    """
+    Keys used to sign and verify access tokens
+
+    Tokens are signed with the most recently activated key that is
+    currently signing and name it in their `kid` header. Rotation is
+    scheduled through each key's activation and retirement times: a new
+    key is published `prepublish` ahead of activation so verifiers can
+    fetch it in time, and a retired key verifies for `overlap` longer.
+    """
+
+    def __init__(
+            self,
+            keys: List[SigningKey],
+            overlap: timedelta,
+            prepublish: timedelta,
+            codec: str = "fast",
+    ) -> None:
+        kids = [key.kid for key in keys]
+        if len(set(kids)) != len(kids):
+            raise ValueError("Signing key ids must be unique")
+
+        for key in keys:
+            key.use_codec(codec)
+        self.keys = keys
+        self.overlap = overlap
+        self.prepublish = prepublish
+        self._by_kid = {key.kid: key for key in keys}
+        # Tokens we issue start with their key's header segment, which spares
+        # parsing the header to find the kid
+        self._by_header = {key.codec.header_segment: key for key in keys}
+        # Current signing key and the time.time() until which it stays current
+        self._signing: Optional[Tuple[SigningKey, float]] = None
+
+    def signing_key(self, now: Optional[datetime] = None) -> SigningKey:
+        """
+        Key that signs new tokens; raises RuntimeError when none is active
+        """
+        if now is not None:
+            return self._select(now)
+
+        # The choice only changes when some key activates or retires
+        if self._signing is not None and time.time() < self._signing[1]:
+            return self._signing[0]
+        now = _utcnow()
+        key = self._select(now)
+        changes = [
+            moment for ring_key in self.keys for moment in (ring_key.activates_at, ring_key.retires_at)
+            if moment is not None and moment > now
+        ]
+        self._signing = (key, min(changes).timestamp() if changes else math.inf)
+        return key
+
+    def _select(self, now: datetime) -> SigningKey:
+        active = [key for key in self.keys if key.signs_at(now)]
+        if not active:
+            raise RuntimeError("No signing key is active; check the key schedule")
+        return max(active, key=lambda key: key.activates_at or datetime.min.replace(tzinfo=timezone.utc))
+
+    def verification_key(self, kid: Optional[str], now: Optional[datetime] = None) -> Optional[SigningKey]:
+        """
+        Key a token names in its `kid` header, if it may still verify tokens
+        """
+        key = self._by_kid.get(kid)
+        if key is None:
+            return None
+        now = now or _utcnow()
+        if key.retires_at is not None and now >= key.retires_at + self.overlap:
+            return None
+        if key.activates_at is not None and now < key.activates_at:
+            return None
+        return key
+
+    def key_for_token(self, token: str, now: Optional[datetime] = None) -> SigningKey:
+        """
+        Key that verifies a token, raising JWTError when it is unknown or retired
+        """
+        key = self._by_header.get(token.partition(".")[0])
+        kid = key.kid if key is not None else jwt.get_unverified_header(token).get("kid")
+        verification_key = self.verification_key(kid, now)
+        if verification_key is None:
+            raise JWTError(f"Unknown or retired signing key: {kid}")
+        return verification_key
+
+    def jwks(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Public keys verifiers need now or soon, as a JWK Set
+        """
+        now = now or _utcnow()
+        published = [
+            key.public_jwk()
+            for key in self.keys
+            if not key.symmetric
+            and (key.activates_at is None or key.activates_at - self.prepublish <= now)
+            and (key.retires_at is None or now < key.retires_at + self.overlap)
+        ]
+        return {"keys": published}
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            signing_kid = self.signing_key().kid
+        except RuntimeError:
+            signing_kid = None
+        return {"keys": len(self.keys), "signing_kid": signing_kid}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def load_key(entry: Dict[str, Any], base_dir: Path) -> SigningKey:
+    """
+    Build a key from one entry of a keys file
+
+    Symmetric keys take a `secret`; asymmetric ones a PEM `private_key`, or
+    a `private_key_file` relative to the keys file.
+    """
+    algorithm = entry.get("algorithm", "")
+    kid = entry.get("kid")
+    if not kid:
+        raise ValueError("Every key in the keys file needs a kid")
+
+    if algorithm in SYMMETRIC_ALGORITHMS:
+        material = entry.get("secret")
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        material = entry.get("private_key")
+        if material is None and entry.get("private_key_file"):
+            material = (base_dir / entry["private_key_file"]).read_text()
+    else:
+        raise ValueError(f"Unsupported signing algorithm for key {kid}: {algorithm}")
+    if not material:
+        raise ValueError(f"No key material for key {kid}")
+
+    return SigningKey(
+        kid=kid,
+        algorithm=algorithm,
+        key=jwk.construct(material, algorithm),
+        activates_at=_parse_time(entry.get("activates_at")),
+        retires_at=_parse_time(entry.get("retires_at")),
+    )
+
+
+def _entries(text: str) -> List[Dict[str, Any]]:
+    entries = json.loads(text).get("keys", [])
+    if not entries:
+        raise ValueError("The key ring has no keys")
+    return entries
+
+
+class KeySource(ABC):
+    """
+    Where the entries of a key ring come from
+    """
+
+    description = ""
+
+    @abstractmethod
+    def version(self) -> Any:
+        """
+        Cheap marker that changes whenever the keys may have changed
+        """
+
+    @abstractmethod
+    def read(self) -> Tuple[List[Dict[str, Any]], Path]:
+        """
+        Key entries and the directory their key files are relative to
+        """
+
+
+class FileKeySource(KeySource):
+    """
+    JSON keys file and the private key files it names
+
+    Works for secrets mounted from a secret store (Kubernetes, Vault agent,
+    CSI drivers), which update the files by swapping a symlink: the version
+    is the stat of every file behind it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.description = str(path)
+        self._files: List[Path] = [self.path]
+
+    def version(self) -> Any:
+        versions = []
+        for path in self._files:
+            stat = path.stat()
+            versions.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        return tuple(versions)
+
+    def read(self) -> Tuple[List[Dict[str, Any]], Path]:
+        entries = _entries(self.path.read_text())
+        base_dir = self.path.parent
+        self._files = [self.path] + [
+            base_dir / entry["private_key_file"] for entry in entries if entry.get("private_key_file")
+        ]
+        return entries, base_dir
+
+
+class InlineKeySource(KeySource):
+    """
+    Keys file contents from the environment, fixed for the process lifetime
+    """
+
+    description = "JWT_KEYS"
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def version(self) -> Any:
+        return 0
+
+    def read(self) -> Tuple[List[Dict[str, Any]], Path]:
+        return _entries(self.text), Path.cwd()
+
+
+class KeyRingManager:
+    """
+    The current key ring, replaced when its source changes
+
+    Nothing is read until the ring is first needed or `load` is called (at
+    startup), so processes that import the module without signing anything
+    never touch the keys. Workers and nodes reading the same source sign and
+    verify with the same keys. The source is checked every `reload_seconds` and, at most once a
+    second, when a token names a key the ring does not have, as another
+    node may pick up a new key first. A source that fails to load, or has
+    no signing key, is logged and the current ring kept.
+    """
+
+    def __init__(
+            self,
+            source: Optional[KeySource],
+            overlap: timedelta,
+            prepublish: timedelta,
+            codec: str = "fast",
+            reload_seconds: float = 0,
+            fixed: Optional[Callable[[], KeyRing]] = None,
+    ) -> None:
+        self.source = source
+        self.overlap = overlap
+        self.prepublish = prepublish
+        self.codec = codec
+        self.reload_seconds = reload_seconds
+        self._version: Any = None
+        self._checked_at = time.monotonic()
+        self._listeners: List[Callable[[KeyRing, KeyRing], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stats: Dict[str, Any] = {
+            "reloads": 0,
+            "reload_errors": 0,
+            "last_reload_at": None,
+            "last_error": None,
+        }
+        # Builds the ring when there is no source to load and reload
+        self._fixed = fixed
+        self._ring: Optional[KeyRing] = None
+
+    @property
+    def ring(self) -> KeyRing:
+        if self._ring is None:
+            self.load()
+        return self._ring
+
+    def load(self) -> None:
+        """
+        Load the keys if that has not happened yet, raising when they are unusable
+        """
+        if self._ring is None:
+            self._ring = self._fixed() if self.source is None else self._load()
+
+    def _load(self) -> KeyRing:
+        # Versioned before reading, so a change during the read is seen next time
+        version = self.source.version()
+        entries, base_dir = self.source.read()
+        ring = KeyRing([load_key(entry, base_dir) for entry in entries], self.overlap, self.prepublish, self.codec)
+        signing = ring.signing_key()
+        self._version = version
+        logger.info(
+            f"Loaded {len(ring.keys)} signing keys from {self.source.description}, signing with {signing.kid}"
+        )
+        return ring
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Load the source again if it changed; True when the ring was replaced
+        """
+        if self.source is None or self._ring is None:
+            # Not loaded yet: the first load reads the current keys anyway
+            return False
+        self._checked_at = time.monotonic()
+        try:
+            if not force and self.source.version() == self._version:
+                return False
+            ring = self._load()
+        except Exception as e:
+            self._stats["reload_errors"] += 1
+            self._stats["last_error"] = str(e)
+            logger.error(f"Error reloading signing keys from {self.source.description}: {str(e)}")
+            return False
+
+        previous, self._ring = self._ring, ring
+        self._stats["reloads"] += 1
+        self._stats["last_reload_at"] = _utcnow().isoformat()
+        for callback in self._listeners:
+            callback(previous, ring)
+        return True
+
+    def add_listener(self, callback: Callable[[KeyRing, KeyRing], None]) -> None:
+        """
+        Call `callback` with the previous and the new ring after each reload
+        """
+        self._listeners.append(callback)
+
+    def signing_key(self, now: Optional[datetime] = None) -> SigningKey:
+        return self.ring.signing_key(now)
+
+    def key_for_token(self, token: str, now: Optional[datetime] = None) -> SigningKey:
+        try:
+            return self.ring.key_for_token(token, now)
+        except JWTError:
+            if (
+                    time.monotonic() - self._checked_at < UNKNOWN_KEY_RELOAD_SECONDS
+                    or not self.reload()
+            ):
+                raise
+        return self.ring.key_for_token(token, now)
+
+    def jwks(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        return self.ring.jwks(now)
+
+    def start(self) -> None:
+        if self.source is not None and self.reload_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.ring.stats(),
+            "source": self.source.description if self.source is not None else "SECRET_KEY",
+            **self._stats,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            self.reload()
+
+
+def shared_host_secret(path: Path) -> str:
+    """
+    Secret kept in `path`, generated by the first worker that needs it
+
+    The secret is written to a private temporary file and linked into place,
+    which fails when another worker got there first; every worker then reads
+    the same, complete file.
+    """
+    if not path.exists():
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as handle:
+            handle.write(secrets.token_urlsafe(32) + "\n")
+        try:
+            os.link(temporary, path)
+        except FileExistsError:
+            pass
+        finally:
+            temporary.unlink()
+
+    secret = path.read_text().strip()
+    if not secret:
+        raise ValueError(f"{path} is empty")
+    return secret
+
+
+def create_key_ring(
+        keys_file: Optional[str],
+        keys_json: Optional[str],
+        secret_key: Callable[[], str],
+        algorithm: str,
+        overlap: timedelta,
+        prepublish: timedelta,
+        codec: str = "fast",
+        reload_seconds: float = 0,
+) -> KeyRingManager:
+    """
+    Key ring from a JSON keys file or its contents, or a single SECRET_KEY
+    key without either, loaded when first needed
+
+    `secret_key` is only called in the last case.
+    The keys hold `{"keys": [{"kid", "algorithm", "secret" | "private_key"
+    | "private_key_file", "activates_at", "retires_at"}, ...]}`. Only a keys
+    file is reloaded.
+    """
+    if keys_file:
+        return KeyRingManager(FileKeySource(keys_file), overlap, prepublish, codec, reload_seconds)
+    if keys_json:
+        return KeyRingManager(InlineKeySource(keys_json), overlap, prepublish, codec, reload_seconds)
+    if algorithm not in SYMMETRIC_ALGORITHMS:
+        raise ValueError(f"{algorithm} needs JWT_KEYS_FILE; SECRET_KEY only works with HS algorithms")
+
+    def secret_key_ring() -> KeyRing:
+        # No kid: tokens look exactly like before key rings existed
+        key = SigningKey(kid=None, algorithm=algorithm, key=jwk.construct(secret_key(), algorithm))
+        return KeyRing([key], overlap, prepublish, codec)
+
+    return KeyRingManager(None, overlap, prepublish, codec, fixed=secret_key_ring)
@@ -0,0 +1,277 @@
+import bisect
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# (labels, value) pairs produced by a collector at scrape time
+Sample = Tuple[Dict[str, str], float]
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100, 500)
+
+
+def route_label(scope: Optional[Dict[str, Any]]) -> str:
+    """
+    Route template of a request scope, e.g. "/users/{user_id}"
+
+    Work outside requests (startup, background jobs) is "background", and
+    requests that matched no route are "unmatched" so scans of random paths
+    cannot add series.
+    """
+    if scope is None:
+        return "background"
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    """
+    A named metric family with one child per combination of label values
+
+    Recording takes no lock: every recording site runs on the event loop
+    thread, and a scrape that races an update only sees it a little early
+    or late. The lock is only taken when a new label combination appears.
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def labels(self, *values: str) -> Any:
+        """
+        Child for the given label values; hot paths can keep the result
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(dict(zip(self.labelnames, values)), child))
+        return lines
+
+    @abstractmethod
+    def _new_child(self) -> Any:
+        ...
+
+    @abstractmethod
+    def _render_child(self, labels: Dict[str, str], child: Any) -> List[str]:
+        ...
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing total
+    """
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def _render_child(self, labels: Dict[str, str], child: _CounterChild) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"]
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Sequence[float]) -> None:
+        self.upper_bounds = upper_bounds
+        # Per-bucket counts; the last slot is +Inf. Made cumulative at scrape time
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values over fixed buckets
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+
+    def _render_child(self, labels: Dict[str, str], child: _HistogramChild) -> List[str]:
+        counts = list(child.counts)
+        lines = []
+        cumulative = 0
+        for upper_bound, count in zip(self.upper_bounds + (float("inf"),), counts):
+            cumulative += count
+            bucket_labels = _format_labels({**labels, "le": _format_value(upper_bound)})
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Metric whose samples are read from other objects' stats at scrape time
+    """
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            type_name: str,
+            collect: Callable[[], Iterable[Sample]],
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.type_name = type_name
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Metrics exposed by this process in the Prometheus text format
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+
+    def register(self, metric: Any) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(
+            self,
+            name: str,
+            documentation: str,
+            type_name: str,
+            collect: Callable[[], Iterable[Sample]],
+    ) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, type_name, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# HTTP
+HTTP_REQUESTS = metrics.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status"),
+)
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route"),
+)
+
+# Authentication
+LOGINS = metrics.counter("auth_logins_total", "Login attempts by outcome", ("result",))
+PASSWORD_HASH_SECONDS = metrics.histogram(
+    "password_hash_duration_seconds",
+    "bcrypt run time in the hashing pool by operation",
+    ("operation",),
+    HASH_BUCKETS,
+)
+PASSWORD_HASH_WAIT_SECONDS = metrics.histogram(
+    "password_hash_wait_seconds",
+    "Time bcrypt jobs waited for a hashing worker by operation",
+    ("operation",),
+)
+JWT_SECONDS = metrics.histogram(
+    "jwt_duration_seconds", "JWT encode and decode time", ("operation",), FAST_BUCKETS,
+)
+
+# Database
+DB_QUERY_SECONDS = metrics.histogram(
+    "db_query_duration_seconds", "SQL statement execution time by route", ("route",),
+)
+DB_QUERIES_PER_REQUEST = metrics.histogram(
+    "db_queries_per_request", "SQL statements run by one request", ("route",), COUNT_BUCKETS,
+)
@@ -0,0 +1,50 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+from backend.app.core.config import settings
+
+# Role name -> bit, in the order of settings.ROLES
+ROLE_BITS: Dict[str, int] = {name: 1 << position for position, name in enumerate(settings.ROLES)}
+
+ROLE_USER = ROLE_BITS["USER"]
+ROLE_ADMIN = ROLE_BITS["ADMIN"]
+
+
+class UnknownRoleError(ValueError):
+    """
+    Raised when a role name is not in the registry
+    """
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self.names = sorted(names)
+        super().__init__(f"Unknown roles: {', '.join(self.names)}")
+
+
+def roles_to_mask(names: Iterable[str]) -> int:
+    """
+    Bitmask for a collection of role names
+    """
+    mask = 0
+    unknown = set()
+    for name in names:
+        bit = ROLE_BITS.get(name)
+        if bit is None:
+            unknown.add(name)
+        else:
+            mask |= bit
+
+    if unknown:
+        raise UnknownRoleError(unknown)
+    return mask
+
+
+@lru_cache(maxsize=256)
+def _mask_to_roles(mask: int) -> Tuple[str, ...]:
+    return tuple(name for name, bit in ROLE_BITS.items() if mask & bit)
+
+
+def mask_to_roles(mask: int) -> List[str]:
+    """
+    Role names set in a bitmask, in registry order
+    """
+    return list(_mask_to_roles(mask))
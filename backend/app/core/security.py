@@ -1,39 +1,118 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
+from pathlib import Path
 from typing import Any, Dict, Optional
+import hashlib
+import logging
+import time
 from passlib.context import CryptContext
-from jose import jwt
 
+from backend.app.core.cache import TTLCache
 from backend.app.core.config import settings
+from backend.app.core.keys import KeyRing, KeyRingManager, create_key_ring, shared_host_secret
+from backend.app.core.metrics import JWT_SECONDS
+from backend.app.models.token import TokenPayload
+
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_encode_seconds = JWT_SECONDS.labels("encode")
+_decode_seconds = JWT_SECONDS.labels("decode")
+
+def _secret_key() -> str:
+    if settings.SECRET_KEY:
+        return settings.SECRET_KEY
+    logger.warning(
+        f"SECRET_KEY is not set; signing with the secret in {settings.SECRET_KEY_FILE}, "
+        "so tokens are only valid on this host. Set SECRET_KEY or JWT_KEYS_FILE on every node."
+    )
+    return shared_host_secret(Path(settings.SECRET_KEY_FILE))
+
+# Signing keys, loaded at startup or first use; retired keys verify for an
+# access token lifetime unless configured
+key_ring: KeyRingManager = create_key_ring(
+    settings.JWT_KEYS_FILE,
+    settings.JWT_KEYS,
+    _secret_key,
+    settings.ALGORITHM,
+    overlap=timedelta(seconds=(
+        settings.JWT_KEY_OVERLAP_SECONDS
+        if settings.JWT_KEY_OVERLAP_SECONDS is not None
+        else settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )),
+    prepublish=timedelta(seconds=settings.JWT_KEY_PREPUBLISH_SECONDS),
+    codec=settings.JWT_CODEC,
+    reload_seconds=settings.JWT_KEYS_RELOAD_SECONDS,
+)
+
+# Verified access tokens keyed by digest, each kept until the token's own exp
+token_cache: TTLCache[TokenPayload] = TTLCache(settings.TOKEN_CACHE_MAX_SIZE)
+
+def _keys_reloaded(previous: KeyRing, ring: KeyRing) -> None:
+    # Tokens of a key that was removed must stop verifying now, not at their exp
+    token_cache.clear()
+
+key_ring.add_listener(_keys_reloaded)
+
 def create_access_token(
-        subject: str, username: str, roles: list[str], expires_delta: Optional[timedelta] = None
+        subject: str,
+        username: str,
+        tenant: str,
+        role_mask: int,
+        expires_delta: Optional[timedelta] = None,
+        version: int = 0,
 ) -> str:
     """
     Create a JWT access token for the user
     """
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    lifetime = expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    now = time.time()
 
+    # NumericDate claims, as python-jose would convert datetimes
     to_encode = {
         "sub": subject,
         "username": username,
-        "roles": roles,
-        "exp": expire,
-        "iat": datetime.utcnow()
+        "tid": tenant,
+        "rm": role_mask,
+        "ver": version,
+        "exp": int(now + lifetime.total_seconds()),
+        "iat": int(now),
     }
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    start = time.perf_counter()
+    token = key_ring.signing_key().codec.encode(to_encode)
+    _encode_seconds.observe(time.perf_counter() - start)
+    return token
 
 def verify_token(token: str) -> Dict[str, Any]:
     """
-    Decode and verify a JWT token
+    Decode and verify a JWT token with the ring key named by its `kid` header
     """
-    return jwt.decode(
-        token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-    )
+    start = time.perf_counter()
+    try:
+        return key_ring.key_for_token(token).codec.decode(token)
+    finally:
+        _decode_seconds.observe(time.perf_counter() - start)
+
+def decode_access_token(token: str) -> TokenPayload:
+    """
+    Verify an access token and parse its payload, reusing earlier results
+
+    Raises JWTError or ValidationError when the token is not valid.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+
+    payload = TokenPayload(**verify_token(token))
+    token_cache.set(key, payload, expires_at=payload.exp.timestamp())
+    return payload
+
+def hash_refresh_token(token: str) -> str:
+    """
+    Fixed-width lookup key for a refresh token
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -0,0 +1,41 @@
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # the fast-json extra; the stdlib encoder produces the same JSON, only slower
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        # What pydantic's .json() writes, and orjson for naive datetimes
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default)
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Compact UTF-8 JSON of plain data, with orjson when it is installed
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return _encoder.encode(content).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response for content that is already plain, trusted data
+
+    Returning it from a route skips FastAPI's validation and serialization
+    against `response_model`, which stays on the route for the docs only.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,184 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from abc import ABC, abstractmethod
+from calendar import timegm
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from jose import jwt
+from jose.backends.base import Key
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+
+# Codec backends selectable with JWT_CODEC
+CODEC_BACKENDS = ("fast", "jose")
+
+HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+# Claims whose checks need arguments the fast path never has (audience,
+# access token); tokens carrying them are decoded by python-jose
+_DELEGATED_CLAIMS = frozenset(("aud", "jti", "at_hash"))
+
+# Same output as python-jose's json.dumps(..., separators=(",", ":")),
+# without building an encoder per call
+_compact_json = json.JSONEncoder(separators=(",", ":"))
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+_FROM_URLSAFE = bytes.maketrans(b"-_", b"+/")
+
+
+def _b64decode(segment: bytes) -> bytes:
+    # base64.urlsafe_b64decode without its wrappers; as lenient as python-jose,
+    # so both accept the same tokens
+    return binascii.a2b_base64(segment.translate(_FROM_URLSAFE) + b"=" * (-len(segment) % 4))
+
+
+def _numeric_date(claims: Dict[str, Any], name: str) -> Optional[int]:
+    if name not in claims:
+        return None
+    try:
+        return int(claims[name])
+    except (TypeError, ValueError):
+        raise JWTClaimsError(f"{name} claim must be an integer")
+
+
+class TokenCodec(ABC):
+    """
+    Signs and verifies the JWTs of one signing key
+
+    `encode` takes the claims with datetime or numeric exp/iat/nbf and
+    `decode` returns the verified claims, raising JWTError (or one of its
+    subclasses) like python-jose does.
+    """
+
+    name = ""
+
+    def __init__(self, algorithm: str, key: Key, verifier: Key, headers: Dict[str, Any]) -> None:
+        self.algorithm = algorithm
+        self.key = key
+        self.verifier = verifier
+        self.headers = headers
+
+    @abstractmethod
+    def encode(self, claims: Dict[str, Any]) -> str:
+        ...
+
+    @abstractmethod
+    def decode(self, token: str) -> Dict[str, Any]:
+        ...
+
+    @property
+    def header_segment(self) -> str:
+        """
+        First segment of every token this codec encodes
+        """
+        header = {"alg": self.algorithm, "typ": "JWT", **self.headers}
+        return _b64encode(json.dumps(header, separators=(",", ":"), sort_keys=True).encode()).decode()
+
+
+class JoseCodec(TokenCodec):
+    """
+    Generic python-jose path, for every algorithm
+    """
+
+    name = "jose"
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        return jwt.encode(claims, self.key, algorithm=self.algorithm, headers=self.headers or None)
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        return jwt.decode(token, self.verifier, algorithms=[self.algorithm])
+
+
+class HMACCodec(JoseCodec):
+    """
+    HS256/384/512 tokens without python-jose's per-call setup
+
+    The header segment and the keyed HMAC state are computed once; each
+    token costs one compact JSON dump, base64 and an HMAC over the copied
+    state. Output is byte for byte what python-jose produces. Tokens whose
+    header differs from ours, or that carry claims we never issue, are
+    handed to python-jose so both accept and reject the same tokens.
+    """
+
+    name = "fast"
+
+    def __init__(self, algorithm: str, key: Key, verifier: Key, headers: Dict[str, Any]) -> None:
+        super().__init__(algorithm, key, verifier, headers)
+        self._mac = hmac.new(key.prepared_key, digestmod=HMAC_DIGESTS[algorithm])
+        self._header = self.header_segment.encode()
+        self._prefix = self._header + b"."
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        claims = dict(claims)
+        for name in ("exp", "iat", "nbf"):
+            value = claims.get(name)
+            if isinstance(value, datetime):
+                claims[name] = timegm(value.utctimetuple())
+        signing_input = self._prefix + _b64encode(_compact_json.encode(claims).encode())
+        return (signing_input + b"." + _b64encode(self._sign(signing_input))).decode()
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        data = token.encode()
+        header, _, rest = data.partition(b".")
+        payload, dot, signature = rest.rpartition(b".")
+        if header != self._header or not dot or b"." in payload:
+            return super().decode(token)
+
+        try:
+            expected = _b64decode(signature)
+            payload_data = _b64decode(payload)
+        except binascii.Error:
+            raise JWTError("Invalid padding")
+        if not hmac.compare_digest(self._sign(data[:len(header) + 1 + len(payload)]), expected):
+            raise JWTError("Signature verification failed.")
+
+        try:
+            claims = json.loads(payload_data.decode("utf-8"))
+        except ValueError as e:
+            raise JWTError(f"Invalid payload string: {e}")
+        if not isinstance(claims, dict):
+            raise JWTError("Invalid payload string: must be a json object")
+        if not _DELEGATED_CLAIMS.isdisjoint(claims):
+            return super().decode(token)
+
+        now = int(time.time())
+        nbf = _numeric_date(claims, "nbf")
+        if nbf is not None and nbf > now:
+            raise JWTClaimsError("The token is not yet valid (nbf)")
+        exp = _numeric_date(claims, "exp")
+        if exp is not None and exp < now:
+            raise ExpiredSignatureError("Signature has expired.")
+        _numeric_date(claims, "iat")
+        if "sub" in claims and not isinstance(claims["sub"], str):
+            raise JWTClaimsError("Subject must be a string.")
+        return claims
+
+
+def create_codec(
+        algorithm: str,
+        key: Key,
+        verifier: Key,
+        headers: Dict[str, Any],
+        backend: str = "fast",
+) -> TokenCodec:
+    """
+    Codec for a key: the fast path where one exists, python-jose otherwise
+    """
+    if backend not in CODEC_BACKENDS:
+        raise ValueError(f"Unknown JWT codec {backend}; use one of {', '.join(CODEC_BACKENDS)}")
+    if backend == "fast" and algorithm in HMAC_DIGESTS:
+        return HMACCodec(algorithm, key, verifier, headers)
+    return JoseCodec(algorithm, key, verifier, headers)
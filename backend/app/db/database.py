@@ -1,17 +1,165 @@
-from typing import Generator
-from sqlmodel import Session, SQLModel, create_engine
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from backend.app.core.config import settings
+from backend.app.core.security import decode_access_token
+from backend.app.db.engine_profiles import check_profile, engine_options, install_profile
+from backend.app.db.instrumentation import instrument_engine
+from backend.app.db.replicas import ReplicaRouter
+from backend.app.db.sharding import DEFAULT_SHARD, Shard, TenantMovingError, TenantRouter, UnknownTenantError
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    echo=True,
-    connect_args={"check_same_thread": False}
+# Async drivers used for plain database URLs
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def get_async_url(url: str) -> str:
+    """
+    Rewrite a database URL to use its async driver
+    """
+    scheme, separator, rest = url.partition("://")
+    if "+" in scheme:
+        # Driver already chosen explicitly
+        return url
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+def create_engine(url: str, profile: str = "default") -> AsyncEngine:
+    """
+    Create an async engine for a database URL under an engine profile
+    """
+    async_url = get_async_url(url)
+    async_engine = create_async_engine(async_url, **engine_options(async_url, profile))
+    install_profile(async_engine.sync_engine, profile)
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+engine = create_engine(settings.DATABASE_URL, settings.DATABASE_ENGINE_PROFILE)
+
+# Objects stay usable after commit; async sessions cannot lazy-load expired attributes
+async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+def create_shard(name: str, shard_engine: AsyncEngine, replica_urls: List[str]) -> Shard:
+    """
+    Wrap an engine and its read replicas as a shard
+    """
+    session_factory = (
+        async_session if shard_engine is engine
+        else sessionmaker(shard_engine, class_=AsyncSession, expire_on_commit=False)
+    )
+    # GET routes and auth lookups read through replicas when any are configured
+    read = ReplicaRouter(
+        session_factory,
+        [create_engine(url, settings.DATABASE_ENGINE_PROFILE) for url in replica_urls],
+        retry_seconds=settings.DATABASE_REPLICA_RETRY_SECONDS,
+        sticky_seconds=settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+    )
+    return Shard(name, shard_engine, read)
+
+if DEFAULT_SHARD in settings.DATABASE_SHARDS:
+    raise ValueError(f"DATABASE_SHARDS cannot redefine the {DEFAULT_SHARD} shard")
+
+tenant_router = TenantRouter(
+    {
+        DEFAULT_SHARD: create_shard(DEFAULT_SHARD, engine, settings.DATABASE_READ_REPLICA_URLS),
+        **{
+            name: create_shard(
+                name,
+                create_engine(url, settings.DATABASE_ENGINE_PROFILE),
+                settings.DATABASE_SHARD_REPLICA_URLS.get(name, []),
+            )
+            for name, url in settings.DATABASE_SHARDS.items()
+        },
+    },
+    pins=settings.TENANT_SHARD_MAP,
+    refresh_seconds=settings.TENANT_PLACEMENT_REFRESH_SECONDS,
 )
 
-def get_db() -> Generator[Session, None, None]:
+def client_identity(request: Request) -> Tuple[Optional[str], Optional[Any]]:
+    """
+    Tenant and read-your-writes key of the client
+
+    Authenticated clients are keyed by (tenant, user id), so changes made to
+    a user by anyone also count; anonymous clients by address and routed to
+    the default shard.
     """
-    Dependency to get a database session
+    auth_header = request.headers.get("authorization", "")
+    if auth_header.startswith("Bearer "):
+        try:
+            payload = decode_access_token(auth_header[len("Bearer "):])
+        except Exception:
+            # get_current_user rejects the token later on
+            return None, None
+        return payload.tid, (payload.tid, int(payload.sub))
+    return None, request.client.host if request.client else None
+
+def _unknown_tenant() -> HTTPException:
+    # Tokens only name tenants that exist, so an unplaced one means no such user
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency to get a session on the primary of the client's shard, for writes
+    """
+    tenant, key = client_identity(request)
+    try:
+        shard = await tenant_router.shard_for_write(tenant)
+    except TenantMovingError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Tenant is being moved to another shard, retry shortly",
+            headers={"Retry-After": str(int(tenant_router.refresh_seconds) or 1)},
+        )
+    except UnknownTenantError:
+        raise _unknown_tenant()
+
+    shard.read.note_write(key)
+    async with shard.session() as session:
+        yield session
+    # Restart the window once the write has finished
+    shard.read.note_write(key)
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency to get a read-only session on the client's shard, on a replica when possible
     """
-    with Session(engine) as session:
+    tenant, key = client_identity(request)
+    try:
+        shard = await tenant_router.shard_for(tenant)
+    except UnknownTenantError:
+        raise _unknown_tenant()
+    async with await shard.read.open_session(key) as session:
         yield session
+
+async def check_engine() -> None:
+    """
+    Fail startup if the database is unreachable or the profile did not apply
+    """
+    for shard in tenant_router.shards.values():
+        async with shard.engine.connect() as conn:
+            await conn.run_sync(check_profile, settings.DATABASE_ENGINE_PROFILE)
+
+        # A replica that is down is only skipped; reads fall back to the primary
+        for replica in shard.read.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    await conn.run_sync(check_profile, settings.DATABASE_ENGINE_PROFILE)
+            except Exception as e:
+                shard.read.mark_down(replica, e)
+
+def engine_stats() -> Dict[str, Any]:
+    """
+    Engine profile, shard placement and connection pool statistics
+    """
+    return {
+        "profile": settings.DATABASE_ENGINE_PROFILE,
+        **tenant_router.stats(),
+    }
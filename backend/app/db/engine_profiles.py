@@ -0,0 +1,191 @@
+import logging
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool
+
+from backend.app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Engine profiles selectable through DATABASE_ENGINE_PROFILE
+ENGINE_PROFILES = ("default", "sqlite-production", "server")
+
+
+class CheckoutStats:
+    """
+    Time spent waiting for a pooled connection
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, wait_seconds: float) -> None:
+        self.count += 1
+        self.wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        count = self.count or 1
+        return {
+            "checkouts": self.count,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": self.wait_seconds / count * 1000,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+        }
+
+
+class _TimedCheckout:
+    """
+    Pool mixin recording how long each checkout waits
+
+    The stats survive `recreate()`, which `engine.dispose()` uses to swap pools.
+    """
+
+    checkout_stats: CheckoutStats
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+    def connect(self) -> Any:
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.checkout_stats.timeouts += 1
+            raise
+        self.checkout_stats.record(time.perf_counter() - start)
+        return connection
+
+    def recreate(self) -> Pool:
+        pool = super().recreate()
+        pool.checkout_stats = self.checkout_stats
+        return pool
+
+
+class TimedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedNullPool(_TimedCheckout, NullPool):
+    pass
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return _is_sqlite(url) and make_url(url).database in (None, "", ":memory:")
+
+
+def engine_options(url: str, profile: str) -> Dict[str, Any]:
+    """
+    Keyword arguments for `create_async_engine` under an engine profile
+
+    Raises ValueError when the profile is unknown or does not fit the URL.
+    """
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown database engine profile: {profile}")
+
+    options: Dict[str, Any] = {}
+
+    if profile == "default":
+        # Driver defaults: a fresh connection per checkout for SQLite files;
+        # in-memory databases keep the driver's single shared connection
+        if _is_sqlite(url):
+            options["connect_args"] = {"check_same_thread": False}
+            if not _is_memory_sqlite(url):
+                options["poolclass"] = TimedNullPool
+        else:
+            options["poolclass"] = TimedQueuePool
+        return options
+
+    if profile == "sqlite-production":
+        if not _is_sqlite(url) or _is_memory_sqlite(url):
+            raise ValueError("The sqlite-production profile requires a SQLite database file")
+        options["connect_args"] = {"check_same_thread": False}
+    elif _is_sqlite(url):
+        raise ValueError("The server profile requires a client-server database")
+    else:
+        options["pool_recycle"] = settings.DATABASE_POOL_RECYCLE_SECONDS
+        options["pool_pre_ping"] = settings.DATABASE_POOL_PRE_PING
+
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT_SECONDS,
+    )
+    return options
+
+
+def _sqlite_pragmas() -> Dict[str, Any]:
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+    }
+
+
+def install_profile(sync_engine: Any, profile: str) -> None:
+    """
+    Attach connect-time setup required by a profile
+    """
+    if profile != "sqlite-production":
+        return
+
+    pragmas = _sqlite_pragmas()
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def check_profile(connection: Any, profile: str) -> None:
+    """
+    Verify on a live connection that the profile took effect
+
+    Runs through `AsyncConnection.run_sync` at startup.
+    """
+    connection.exec_driver_sql("SELECT 1")
+    if profile != "sqlite-production":
+        return
+
+    journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+    if str(journal_mode).lower() != "wal":
+        raise RuntimeError(f"SQLite journal_mode is {journal_mode}, expected wal")
+
+    # 1 is NORMAL
+    synchronous = connection.exec_driver_sql("PRAGMA synchronous").scalar()
+    if synchronous != 1:
+        raise RuntimeError(f"SQLite synchronous is {synchronous}, expected NORMAL")
+
+
+def pool_stats(pool: Pool) -> Dict[str, Any]:
+    """
+    Occupancy and checkout wait times of an engine's pool
+    """
+    stats: Dict[str, Any] = {"pool": type(pool).__name__}
+    if hasattr(pool, "checkedout"):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    checkout_stats = getattr(pool, "checkout_stats", None)
+    if checkout_stats is not None:
+        stats.update(checkout_stats.as_dict())
+    return stats
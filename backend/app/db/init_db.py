@@ -1,36 +1,48 @@
 import logging
-from sqlmodel import SQLModel, Session
-from backend.app.db.database import engine
+from sqlmodel import SQLModel, select
+from backend.app.core.roles import ROLE_ADMIN, ROLE_USER
+from backend.app.db.database import tenant_router
+from backend.app.db.migrations import ensure_indexes, upgrade_schema
 from backend.app.models.user import User
+from backend.app.models.tenant import TenantPlacement, TenantVersion
 from backend.app.models.token import RefreshToken
-from backend.app.core.security import get_password_hash
+from backend.app.services.hashing import password_hasher
+from backend.app.services.tenant_version import bump_tenant_version
 
 logger = logging.getLogger(__name__)
 
-def init_db() -> None:
+async def init_db() -> None:
     """
     Initialize the database with tables and default data
     """
-    # Create tables
-    SQLModel.metadata.create_all(engine)
+    # Upgrade existing tables, then create missing ones; only the default
+    # shard holds refresh tokens and tenant placements
+    for shard in tenant_router.shards.values():
+        tables = None if shard is tenant_router.default else [User.__table__, TenantVersion.__table__]
+        async with shard.engine.begin() as conn:
+            await conn.run_sync(upgrade_schema)
+            await conn.run_sync(SQLModel.metadata.create_all, tables=tables)
+            await conn.run_sync(ensure_indexes)
     logger.info("Database tables created")
 
-    # Check if admin user exists
-    with Session(engine) as session:
-        admin = session.query(User).filter(User.username == "admin").first()
+    await tenant_router.seed_placements()
 
-        if not admin:
+    # Check if admin user exists on any shard
+    if not await tenant_router.scatter(select(User.id).where(User.username == "admin")):
+        shard = await tenant_router.place("default")
+        async with shard.session() as session:
             # Create default admin user
             admin_user = User(
                 username="admin",
                 email="admin@example.com",
                 full_name="Admin User",
-                hashed_password=get_password_hash("admin"),
-                roles="ADMIN,USER",
+                hashed_password=await password_hasher.hash("admin"),
+                role_mask=ROLE_ADMIN | ROLE_USER,
                 tenant="default"
             )
 
             session.add(admin_user)
-            session.commit()
+            await bump_tenant_version(session, "default")
+            await session.commit()
 
             logger.info("Default admin user created")
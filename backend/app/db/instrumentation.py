@@ -0,0 +1,102 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from backend.app.core.config import settings
+from backend.app.core.metrics import DB_QUERY_SECONDS, route_label
+
+logger = logging.getLogger(__name__)
+
+# Characters of SQL kept in log lines
+MAX_LOGGED_STATEMENT = 500
+
+
+class QueryProfile:
+    """
+    Statements run while serving one request
+
+    Set through `current_profile` by QueryProfileMiddleware. Tasks spawned by
+    the request (e.g. shard scatters) inherit the context and add to the
+    same profile.
+    """
+
+    __slots__ = ("scope", "count", "seconds", "statements")
+
+    def __init__(self, scope: Optional[Dict[str, Any]] = None) -> None:
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+        # Executions per (engine, SQL text); bind values are not part of the key
+        self.statements: Dict[Tuple[Any, str], int] = {}
+
+    def record(self, engine: Any, statement: str, seconds: float, executemany: bool) -> None:
+        self.count += 1
+        self.seconds += seconds
+        # Batched writes run one statement per chunk on purpose
+        if not executemany:
+            key = (engine, statement)
+            self.statements[key] = self.statements.get(key, 0) + 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+        Statements run at least `threshold` times, most frequent first
+        """
+        if threshold <= 0:
+            return []
+        counts = [
+            (statement, count)
+            for (_, statement), count in self.statements.items()
+            if count >= threshold
+        ]
+        return sorted(counts, key=lambda item: item[1], reverse=True)
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="queries: {self.count}"'
+
+
+current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("current_profile", default=None)
+
+
+def shorten(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > MAX_LOGGED_STATEMENT:
+        return statement[:MAX_LOGGED_STATEMENT] + "..."
+    return statement
+
+
+def instrument_engine(sync_engine: Any) -> None:
+    """
+    Time every statement for metrics, the request's profile and the slow query log
+    """
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_timer(
+            conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool,
+    ) -> None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _record(
+            conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool,
+    ) -> None:
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        profile = current_profile.get()
+        route = route_label(profile.scope if profile else None)
+
+        DB_QUERY_SECONDS.labels(route).observe(elapsed)
+        if profile is not None:
+            profile.record(sync_engine, statement, elapsed, executemany)
+
+        # Parameters are left out; they may hold credentials or personal data
+        if settings.DATABASE_SLOW_QUERY_MS and elapsed * 1000 >= settings.DATABASE_SLOW_QUERY_MS:
+            logger.warning(f"Slow query ({elapsed * 1000:.1f} ms) on {route}: {shorten(statement)}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _discard_timer(context: Any) -> None:
+        # Failed statements never reach after_cursor_execute
+        starts = context.connection.info.get("query_start") if context.connection else None
+        if starts:
+            starts.pop()
@@ -0,0 +1,164 @@
+import logging
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import Boolean, DateTime, Integer, String, column, inspect, select, table
+from sqlalchemy.engine import Connection
+from sqlmodel import SQLModel
+
+from backend.app.core.roles import ROLE_BITS
+from backend.app.core.security import hash_refresh_token
+from backend.app.models.token import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+def upgrade_schema(conn: Connection) -> None:
+    """
+    Bring tables created by earlier versions up to date
+
+    Runs before `create_all` (through `AsyncConnection.run_sync`); every step
+    must be idempotent.
+    """
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+    user_columns = {column["name"] for column in inspector.get_columns("user")} if "user" in tables else set()
+
+    # Checked before any step writes, so a refused upgrade leaves the tables as they were
+    if "roles" in user_columns:
+        _check_role_names(conn)
+
+    if "refreshtoken" in tables:
+        columns = {column["name"] for column in inspector.get_columns("refreshtoken")}
+        if "token_hash" not in columns:
+            _rekey_refresh_tokens(conn)
+        else:
+            if "token_version" not in columns:
+                _add_column(conn, "refreshtoken", "token_version INTEGER NOT NULL DEFAULT 0")
+            if "tenant" not in columns:
+                _add_column(conn, "refreshtoken", "tenant VARCHAR NOT NULL DEFAULT 'default'")
+        if "tenant" not in columns and "user" in tables:
+            _backfill_refresh_token_tenants(conn)
+
+    if "user" in tables:
+        if "token_version" not in user_columns:
+            _add_column(conn, "user", "token_version INTEGER NOT NULL DEFAULT 0")
+        if "roles" in user_columns:
+            _convert_roles_to_mask(conn, has_mask="role_mask" in user_columns)
+
+def ensure_indexes(conn: Connection) -> None:
+    """
+    Create indexes added to models after their tables already existed
+
+    Runs after `create_all`, which only creates indexes for new tables.
+    Shards other than the default one only hold some of the tables.
+    """
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    for table in SQLModel.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                logger.info(f"Created index {index.name}")
+
+def _add_column(conn: Connection, table_name: str, definition: str) -> None:
+    # "user" is a reserved word in PostgreSQL, so table names are quoted
+    conn.exec_driver_sql(f'ALTER TABLE "{table_name}" ADD COLUMN {definition}')
+    logger.info(f"Added column to {table_name}: {definition}")
+
+def _rekey_refresh_tokens(conn: Connection) -> None:
+    """
+    Replace raw refresh token values with their hashed lookup keys
+    """
+    conn.exec_driver_sql("ALTER TABLE refreshtoken RENAME TO refreshtoken_legacy")
+    RefreshToken.__table__.create(conn)
+
+    # Only live tokens are carried over; the rest would be purged anyway
+    legacy = table(
+        "refreshtoken_legacy",
+        column("token", String),
+        column("user_id", Integer),
+        column("expires_at", DateTime),
+        column("revoked", Boolean),
+        column("created_at", DateTime),
+    )
+    rows = conn.execute(
+        select(legacy.c.token, legacy.c.user_id, legacy.c.expires_at, legacy.c.created_at)
+        .where(legacy.c.revoked == False, legacy.c.expires_at > datetime.utcnow())
+    ).all()
+    if rows:
+        conn.execute(
+            RefreshToken.__table__.insert(),
+            [
+                {
+                    "token_hash": hash_refresh_token(row.token),
+                    "user_id": row.user_id,
+                    "expires_at": row.expires_at,
+                    "revoked": False,
+                    "tenant": "default",
+                    "created_at": row.created_at,
+                }
+                for row in rows
+            ],
+        )
+
+    conn.exec_driver_sql("DROP TABLE refreshtoken_legacy")
+    logger.info(f"Re-keyed {len(rows)} refresh tokens by hash")
+
+_legacy_users = table("user", column("roles", String), column("role_mask", Integer))
+
+def _role_names(roles: Optional[str]) -> List[str]:
+    return [name for name in (roles or "").split(",") if name]
+
+def _check_role_names(conn: Connection) -> None:
+    """
+    Refuse to convert roles while some are missing from the registry
+
+    Their assignments would be lost with the `roles` column.
+    """
+    unknown = sorted({
+        name
+        for (roles,) in conn.execute(select(_legacy_users.c.roles).distinct()).all()
+        for name in _role_names(roles)
+        if name not in ROLE_BITS
+    })
+    if unknown:
+        raise RuntimeError(
+            f"Users have roles missing from the ROLES setting: {', '.join(unknown)}. "
+            "Add them to ROLES before upgrading; nothing was changed."
+        )
+
+def _convert_roles_to_mask(conn: Connection, has_mask: bool) -> None:
+    """
+    Replace the comma-separated `roles` column with the `role_mask` bitmask
+    """
+    _check_role_names(conn)
+    if not has_mask:
+        _add_column(conn, "user", "role_mask INTEGER NOT NULL DEFAULT 0")
+
+    users = _legacy_users
+
+    # Few distinct role strings exist, so convert one group at a time
+    for (roles,) in conn.execute(select(users.c.roles).distinct()).all():
+        mask = 0
+        for name in _role_names(roles):
+            mask |= ROLE_BITS[name]
+        conn.execute(users.update().where(users.c.roles == roles).values(role_mask=mask))
+
+    # Needs SQLite 3.35+; the old NOT NULL column would otherwise reject inserts
+    conn.exec_driver_sql('ALTER TABLE "user" DROP COLUMN roles')
+    logger.info("Converted user roles to role_mask")
+
+def _backfill_refresh_token_tenants(conn: Connection) -> None:
+    """
+    Copy each refresh token's tenant from its user
+
+    Runs while every user still lives in this (the default) database.
+    """
+    conn.exec_driver_sql(
+        'UPDATE refreshtoken SET tenant = '
+        '(SELECT "user".tenant FROM "user" WHERE "user".id = refreshtoken.user_id) '
+        'WHERE EXISTS (SELECT 1 FROM "user" WHERE "user".id = refreshtoken.user_id)'
+    )
+    logger.info("Backfilled refresh token tenants")
@@ -0,0 +1,143 @@
+import itertools
+import logging
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.app.core.cache import TTLCache
+from backend.app.db.engine_profiles import pool_stats
+
+logger = logging.getLogger(__name__)
+
+# Stickiness key covering every client, e.g. after a bulk change
+STICKY_ALL = "*"
+
+
+class Replica:
+    """
+    A read replica and its health
+    """
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+        self.session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        self.down_until = 0.0
+        self.reads = 0
+        self.failures = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": repr(self.engine.url),
+            "healthy": self.healthy,
+            "reads": self.reads,
+            "failures": self.failures,
+            **pool_stats(self.engine.sync_engine.pool),
+        }
+
+
+class ReplicaRouter:
+    """
+    Chooses the database used for read-only sessions
+
+    Reads rotate over healthy replicas. A replica that fails to connect is
+    skipped for `retry_seconds`, and when none is usable reads go to the
+    primary. Clients that wrote recently are kept on the primary for
+    `sticky_seconds` so they read their own writes despite replication lag.
+    """
+
+    def __init__(
+            self,
+            primary_session: sessionmaker,
+            replicas: List[AsyncEngine],
+            retry_seconds: float,
+            sticky_seconds: float,
+            max_sticky_clients: int = 100000,
+    ) -> None:
+        self.primary_session = primary_session
+        self.replicas = [Replica(engine) for engine in replicas]
+        self.retry_seconds = retry_seconds
+        self.sticky_seconds = sticky_seconds
+        self.primary_reads = 0
+        self.sticky_reads = 0
+        self._next = itertools.count()
+        self._sticky: TTLCache[bool] = TTLCache(max_sticky_clients, sticky_seconds)
+
+        for replica in self.replicas:
+            self._watch(replica)
+
+    def note_write(self, key: Optional[Hashable]) -> None:
+        """
+        Keep a client's reads on the primary for the stickiness window
+        """
+        if key is not None and self.replicas and self.sticky_seconds > 0:
+            self._sticky.set(key, True)
+
+    def is_sticky(self, key: Optional[Hashable]) -> bool:
+        if self._sticky.get(STICKY_ALL):
+            return True
+        return key is not None and bool(self._sticky.get(key))
+
+    async def open_session(self, key: Optional[Hashable] = None) -> AsyncSession:
+        """
+        Open a session on a replica, or on the primary when needed
+        """
+        if self.replicas and self.is_sticky(key):
+            self.sticky_reads += 1
+        else:
+            for replica in self._candidates():
+                session = replica.session_factory()
+                try:
+                    # Connect now so a dead replica fails over instead of failing the request
+                    await session.connection()
+                except (DBAPIError, OSError) as e:
+                    await session.close()
+                    self.mark_down(replica, e)
+                    continue
+
+                replica.reads += 1
+                return session
+
+        self.primary_reads += 1
+        return self.primary_session()
+
+    def mark_down(self, replica: Replica, error: Exception) -> None:
+        """
+        Take a replica out of rotation for the retry period
+        """
+        replica.failures += 1
+        replica.down_until = time.monotonic() + self.retry_seconds
+        logger.warning(f"Read replica {replica.engine.url!r} unavailable: {str(error)}")
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
+    def _candidates(self) -> List[Replica]:
+        if not self.replicas:
+            return []
+        start = next(self._next) % len(self.replicas)
+        rotated = self.replicas[start:] + self.replicas[:start]
+        return [replica for replica in rotated if replica.healthy]
+
+    def _watch(self, replica: Replica) -> None:
+        # Connections dropped mid-query also take the replica out of rotation
+        @event.listens_for(replica.engine.sync_engine, "handle_error")
+        def _on_error(context: Any) -> None:
+            if context.is_disconnect:
+                self.mark_down(replica, context.original_exception)
@@ -0,0 +1,282 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.sql import Select
+from sqlmodel import select
+
+from backend.app.db.engine_profiles import pool_stats
+from backend.app.db.replicas import STICKY_ALL, ReplicaRouter
+from backend.app.models.tenant import TenantPlacement
+from backend.app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Shard backed by DATABASE_URL; it also holds the placement directory
+DEFAULT_SHARD = "default"
+
+
+class TenantMovingError(Exception):
+    """
+    Raised when writing to a tenant that is being moved between shards
+    """
+
+    def __init__(self, tenant: str) -> None:
+        self.tenant = tenant
+        super().__init__(f"Tenant {tenant} is being moved")
+
+
+class UnknownTenantError(LookupError):
+    """
+    Raised when looking up a tenant that has never been placed on a shard
+    """
+
+    def __init__(self, tenant: str) -> None:
+        self.tenant = tenant
+        super().__init__(f"Tenant {tenant} is not placed on any shard")
+
+
+class HashRing:
+    """
+    Consistent hash ring: adding a shard only relocates about 1/N of new tenants
+    """
+
+    def __init__(self, names: List[str], vnodes: int = 64) -> None:
+        points = sorted(
+            (self._hash(f"{name}#{replica}"), name)
+            for name in names
+            for replica in range(vnodes)
+        )
+        self._keys = [key for key, _ in points]
+        self._names = [name for _, name in points]
+
+    def get(self, key: str) -> str:
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._names[index]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class Shard:
+    """
+    One database holding the users of some tenants, with its read replicas
+    """
+
+    def __init__(self, name: str, engine: AsyncEngine, read: ReplicaRouter) -> None:
+        self.name = name
+        self.engine = engine
+        self.session = read.primary_session
+        self.read = read
+
+    def stats(self) -> Dict[str, Any]:
+        return {**pool_stats(self.engine.sync_engine.pool), "reads": self.read.stats()}
+
+    async def dispose(self) -> None:
+        await self.read.dispose()
+        await self.engine.dispose()
+
+
+class TenantRouter:
+    """
+    Maps tenants to shards
+
+    A tenant's shard is recorded in the `tenantplacement` table of the
+    default shard when the tenant is created (`place`, seeding at startup or
+    the admin tools): pinned by TENANT_SHARD_MAP, otherwise chosen by
+    consistent hashing. Lookups never place a tenant, so request data cannot
+    add placements. Placements are cached in memory and reloaded every
+    `refresh_seconds`, which is how workers learn about tenants moved by
+    `backend.app.tools.tenants`.
+    """
+
+    def __init__(
+            self,
+            shards: Dict[str, Shard],
+            pins: Dict[str, str],
+            refresh_seconds: float,
+    ) -> None:
+        unknown = set(pins.values()) - set(shards)
+        if unknown:
+            raise ValueError(f"TENANT_SHARD_MAP refers to unknown shards: {', '.join(sorted(unknown))}")
+
+        self.shards = shards
+        self.pins = pins
+        self.refresh_seconds = refresh_seconds
+        self._ring = HashRing(sorted(shards))
+        self._placements: Dict[str, Tuple[str, bool]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def default(self) -> Shard:
+        return self.shards[DEFAULT_SHARD]
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.shards) > 1
+
+    async def shard_for(self, tenant: Optional[str]) -> Shard:
+        """
+        Shard holding a tenant; requests without a tenant use the default shard
+
+        Raises UnknownTenantError for tenants that were never placed.
+        """
+        if tenant is None or not self.sharded:
+            return self.default
+        name, _ = await self._resolve(tenant)
+        return self.shards[name]
+
+    async def shard_for_write(self, tenant: Optional[str]) -> Shard:
+        """
+        Like `shard_for`, but refuses tenants that are being moved
+        """
+        if tenant is None or not self.sharded:
+            return self.default
+        name, moving = await self._resolve(tenant)
+        if moving:
+            raise TenantMovingError(tenant)
+        return self.shards[name]
+
+    async def place(self, tenant: str) -> Shard:
+        """
+        Shard of a tenant, placing it first if it is new
+        """
+        if not self.sharded:
+            return self.default
+        try:
+            name, _ = await self._resolve(tenant)
+        except UnknownTenantError:
+            name, _ = await self._place(tenant, self._choose(tenant))
+        return self.shards[name]
+
+    def cached_shard_for(self, tenant: str) -> Shard:
+        """
+        Best-effort lookup that never touches the database
+        """
+        placement = self._placements.get(tenant)
+        return self.shards[placement[0] if placement else self._choose(tenant)]
+
+    async def scatter(self, statement: Select) -> List[Any]:
+        """
+        Run a query on the primary of every shard and concatenate the rows
+        """
+        async def run(shard: Shard) -> List[Any]:
+            async with shard.session() as db:
+                return list((await db.exec(statement)).all())
+
+        results = await asyncio.gather(*(run(shard) for shard in self.shards.values()))
+        return [row for rows in results for row in rows]
+
+    def note_invalidation(self, key: Optional[Tuple[str, int]]) -> None:
+        """
+        Principal cache listener: changed users read from their primary for a while
+        """
+        if key is None:
+            for shard in self.shards.values():
+                shard.read.note_write(STICKY_ALL)
+        else:
+            self.cached_shard_for(key[0]).read.note_write(key)
+
+    def placements(self) -> Dict[str, Tuple[str, bool]]:
+        """
+        Cached (shard, moving) of every placed tenant
+        """
+        return dict(self._placements)
+
+    async def load_placements(self) -> None:
+        """
+        Reload every placement from the directory
+        """
+        async with self.default.session() as db:
+            placements = (await db.exec(select(TenantPlacement))).all()
+        self._placements = {
+            placement.tenant: (placement.shard, placement.moving) for placement in placements
+        }
+
+    async def seed_placements(self) -> None:
+        """
+        Record the current shard of every tenant that already has users
+
+        Runs at startup so enabling sharding, or adding a shard, never
+        relocates existing tenants.
+        """
+        if not self.sharded:
+            return
+
+        await self.load_placements()
+        for shard in self.shards.values():
+            async with shard.session() as db:
+                tenants = (await db.exec(select(User.tenant).distinct())).all()
+            for tenant in tenants:
+                if tenant not in self._placements:
+                    await self._place(tenant, shard.name)
+
+    def start(self) -> None:
+        if self.sharded and self.refresh_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def dispose(self) -> None:
+        for shard in self.shards.values():
+            await shard.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tenants_placed": len(self._placements),
+            "shards": {name: shard.stats() for name, shard in self.shards.items()},
+        }
+
+    def _choose(self, tenant: str) -> str:
+        return self.pins.get(tenant) or self._ring.get(tenant)
+
+    async def _resolve(self, tenant: str) -> Tuple[str, bool]:
+        placement = self._placements.get(tenant)
+        if placement is not None:
+            return placement
+
+        # Placed by another worker since the last reload; misses are not
+        # cached, so unknown names cannot grow the cache either
+        async with self.default.session() as db:
+            existing = await db.get(TenantPlacement, tenant)
+        if existing is None:
+            raise UnknownTenantError(tenant)
+        placement = self._placements[tenant] = (existing.shard, existing.moving)
+        return placement
+
+    async def _place(self, tenant: str, shard: str) -> Tuple[str, bool]:
+        async with self.default.session() as db:
+            db.add(TenantPlacement(tenant=tenant, shard=shard))
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Another worker placed the tenant first
+                await db.rollback()
+                existing = await db.get(TenantPlacement, tenant)
+                placement = (existing.shard, existing.moving)
+            else:
+                placement = (shard, False)
+                logger.info(f"Placed tenant {tenant} on shard {shard}")
+
+        self._placements[tenant] = placement
+        return placement
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.load_placements()
+            except Exception as e:
+                logger.error(f"Error reloading tenant placements: {str(e)}")
@@ -4,10 +4,21 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from backend.app.core.config import settings
+from backend.app.core.security import key_ring, token_cache
+from backend.app.db.database import check_engine, engine, engine_stats, tenant_router
 from backend.app.db.init_db import init_db
 from backend.app.api.auth import router as auth_router
 from backend.app.api.users import router as users_router
+from backend.app.api.metrics import router as metrics_router
+from backend.app.api.jwks import router as jwks_router
 from backend.app.middlewares.token_middleware import TokenRefreshMiddleware
+from backend.app.middlewares.metrics_middleware import MetricsMiddleware
+from backend.app.middlewares.profiling_middleware import QueryProfileMiddleware
+from backend.app.services.hashing import password_hasher
+from backend.app.services.login_throttle import login_throttle
+from backend.app.services.principal_cache import principal_cache
+from backend.app.services.token_purge import refresh_token_purger
+from backend.app.providers.token_store import SQLTokenStore, token_store
 
 # Configure logging
 logging.basicConfig(
@@ -16,16 +27,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger("app")
 
+# Users changed by anyone are read from their shard's primary for a while
+principal_cache.add_listener(tenant_router.note_invalidation)
+
 # Startup and shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Run startup code
     logger.info("Initializing application...")
-    init_db()
+    # Unusable signing keys fail startup rather than the first login
+    key_ring.load()
+    password_hasher.start()
+    await check_engine()
+    await init_db()
     logger.info("Database initialized")
+    tenant_router.start()
+    key_ring.start()
+    await principal_cache.start()
+    if isinstance(token_store, SQLTokenStore):
+        # Other stores expire tokens on their own
+        refresh_token_purger.start(engine)
     yield
     # Run shutdown code
     logger.info("Shutting down application...")
+    await refresh_token_purger.stop()
+    await tenant_router.stop()
+    await key_ring.stop()
+    await token_store.close()
+    await login_throttle.close()
+    await principal_cache.stop()
+    password_hasher.shutdown()
+    await tenant_router.dispose()
 
 # Create FastAPI application
 app = FastAPI(
@@ -48,9 +80,19 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Per-request SQL profile: slow and repeated statements, Server-Timing in debug
+app.add_middleware(QueryProfileMiddleware)
+
+# Outermost, so request latency includes the other middleware
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth_router, prefix=settings.API_V1_STR)
 app.include_router(users_router, prefix=settings.API_V1_STR)
+app.include_router(jwks_router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
 
 @app.get("/")
 async def root():
@@ -69,7 +111,16 @@ async def health_check():
     """
     Health check endpoint
     """
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "database": engine_stats(),
+        "password_hashing": password_hasher.stats(),
+        "login_throttle": login_throttle.stats(),
+        "principal_cache": principal_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "key_ring": key_ring.stats(),
+        "refresh_token_purge": refresh_token_purger.stats(),
+    }
 
 # Run the application with uvicorn
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+import logging
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.app.core.config import settings
+from backend.app.core.metrics import DB_QUERIES_PER_REQUEST, route_label
+from backend.app.db.instrumentation import QueryProfile, current_profile, shorten
+
+logger = logging.getLogger(__name__)
+
+class QueryProfileMiddleware:
+    """
+    Middleware collecting the SQL statements run by each request
+
+    Statements repeated within one request are logged when the response is
+    done, and with DEBUG on the query count and time so far are sent in a
+    `Server-Timing` header (streamed bodies may run more queries afterwards).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile(scope)
+        profile_token = current_profile.set(profile)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", profile.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing if settings.DEBUG else send)
+        finally:
+            current_profile.reset(profile_token)
+            route = route_label(scope)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(profile.count)
+            for statement, count in profile.repeated(settings.DATABASE_REPEATED_QUERY_THRESHOLD):
+                logger.warning(
+                    f"Statement ran {count} times in one request to {scope['method']} {route} "
+                    f"(possible N+1): {shorten(statement)}"
+                )
@@ -1,82 +1,108 @@
 import logging
-from datetime import datetime, timedelta
-import time
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.responses import Response
-from sqlmodel import Session, select
-from jose import jwt, JWTError
-
-from backend.app.db.database import get_db
-from backend.app.models.token import RefreshToken
-from backend.app.models.user import User
-from backend.app.core.config import settings
-from backend.app.core.security import create_access_token
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from jose import JWTError
+
+from backend.app.db.database import tenant_router
+from backend.app.db.sharding import UnknownTenantError
+from backend.app.core.security import create_access_token, decode_access_token
+from backend.app.services.principal_cache import principal_cache
 
 logger = logging.getLogger(__name__)
 
-class TokenRefreshMiddleware(BaseHTTPMiddleware):
+# Paths that never get a refreshed token
+SKIP_PATHS = ("/login", "/refresh", "/logout", "/logout-all", "/introspect", "/docs", "/openapi.json")
+
+# Tokens closer than this to expiry are reissued
+REFRESH_THRESHOLD = timedelta(minutes=5)
+
+class TokenRefreshMiddleware:
     """
     Middleware to handle JWT token refresh logic
     - Checks if token is about to expire and refreshes it
+
+    Implemented as plain ASGI: the new token is added to the
+    `http.response.start` message instead of wrapping the response stream.
     """
 
-    async def dispatch(
-            self, request: Request, call_next: RequestResponseEndpoint
-    ) -> Response:
-        # Process the request and get the response
-        response = await call_next(request)
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-        # Skip refresh for non-authenticated paths
-        path = request.url.path
-        if path.endswith(("/login", "/refresh", "/logout", "/docs", "/openapi.json")):
-            return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].endswith(SKIP_PATHS):
+            await self.app(scope, receive, send)
+            return
 
-        # Extract authorization header
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            return response
+        token = self._get_bearer_token(scope)
+        if token is None:
+            await self.app(scope, receive, send)
+            return
 
-        # Extract the token
-        token = auth_header.replace("Bearer ", "")
+        # Routes publish the verified token payload here (see get_current_user)
+        state = scope.setdefault("state", {})
 
-        try:
-            # Decode JWT
-            payload = jwt.decode(
-                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-            )
+        async def send_with_token(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                new_token = await self._refresh_token(token, state)
+                if new_token:
+                    # Set new token in response header
+                    headers = MutableHeaders(scope=message)
+                    headers["X-New-Access-Token"] = new_token
+                    headers["Access-Control-Expose-Headers"] = "X-New-Access-Token"
+            await send(message)
+
+        await self.app(scope, receive, send_with_token)
 
-            # Check if token is about to expire
-            exp = datetime.fromtimestamp(payload.get("exp"))
-            now = datetime.now()
+    @staticmethod
+    def _get_bearer_token(scope: Scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth_header = value.decode("latin-1")
+                if auth_header.startswith("Bearer "):
+                    return auth_header[len("Bearer "):]
+                return None
+        return None
+
+    @staticmethod
+    async def _refresh_token(token: str, state: dict) -> Optional[str]:
+        try:
+            # Reuse the payload verified by get_current_user, if the route ran it
+            payload = state.get("token_payload")
+            if payload is None:
+                payload = decode_access_token(token)
 
             # If token expires in less than 5 minutes, refresh it
-            if exp - now < timedelta(minutes=5):
-                # Get a database session
-                db = next(get_db())
+            if payload.exp - datetime.now(timezone.utc) >= REFRESH_THRESHOLD:
+                return None
 
+            # Authenticated routes have just cached the principal; otherwise
+            # load it without blocking the event loop
+            user_id = int(payload.sub)
+            principal = principal_cache.get(payload.tid, user_id)
+            if principal is None:
                 try:
-                    # Get user
-                    user_id = int(payload.get("sub"))
-                    user = db.get(User, user_id)
-
-                    if user and not user.disabled:
-                        # Create new access token
-                        roles = user.roles.split(",") if user.roles else []
-                        new_token = create_access_token(
-                            subject=str(user.id),
-                            username=user.username,
-                            roles=roles,
-                        )
-
-                        # Set new token in response header
-                        response.headers["X-New-Access-Token"] = new_token
-                        response.headers["Access-Control-Expose-Headers"] = "X-New-Access-Token"
-                finally:
-                    db.close()
+                    shard = await tenant_router.shard_for(payload.tid)
+                except UnknownTenantError:
+                    return None
+                async with await shard.read.open_session((payload.tid, user_id)) as db:
+                    principal = await principal_cache.load(db, payload.tid, user_id)
 
-        except (JWTError, ValueError) as e:
-            # Log error but don't stop request processing
-            logger.error(f"Error refreshing token: {str(e)}")
+            if not principal or principal.disabled or principal.token_version != payload.ver:
+                return None
 
-        return response
\ No newline at end of file
+            # Create new access token
+            return create_access_token(
+                subject=str(principal.id),
+                username=principal.username,
+                tenant=principal.tenant,
+                role_mask=principal.role_mask,
+                version=principal.token_version,
+            )
+
+        except (JWTError, ValueError) as e:
+            # Bearer values that are not our tokens are the client's problem,
+            # not an error here; the route itself answers 401 where it matters
+            logger.debug(f"Not refreshing token: {str(e)}")
+            return None
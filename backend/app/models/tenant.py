@@ -0,0 +1,21 @@
+from datetime import datetime
+from sqlmodel import Field, SQLModel
+
+class TenantPlacement(SQLModel, table=True):
+    """
+    Database model for the shard holding a tenant's users (primary database only)
+    """
+    tenant: str = Field(primary_key=True)
+    shard: str
+    moving: bool = Field(default=False)  # Writes are refused while a move copies rows
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class TenantVersion(SQLModel, table=True):
+    """
+    Database model for a counter bumped by every change to a tenant's users
+
+    Lives on the tenant's shard and is bumped in the same transaction as the
+    change, so it versions the user listing (see backend.app.services.tenant_version).
+    """
+    tenant: str = Field(primary_key=True)
+    version: int = Field(default=0)
@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Optional, List
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 from pydantic import BaseModel
 
@@ -18,9 +19,15 @@ class TokenPayload(BaseModel):
     """
     sub: str  # user id
     username: str
-    roles: List[str]
+    tid: str = "default"  # tenant, which selects the user's shard
+    rm: int = 0  # role bitmask (see backend.app.core.roles)
     exp: datetime
     iat: datetime
+    ver: int = 0  # user's token_version at issue time
+
+    class Config:
+        # Verified payloads are cached and shared between requests
+        allow_mutation = False
 
 class TokenResponse(Token):
     """
@@ -34,11 +41,18 @@ class RefreshToken(SQLModel, table=True):
     """
     Database model for refresh tokens
     """
+    __table_args__ = (
+        # Per-user lookups filter on revoked and expires_at
+        Index("ix_refreshtoken_user_revoked_expires", "user_id", "revoked", "expires_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    token: str = Field(index=True, unique=True)
-    user_id: int = Field(index=True)  # No foreign key for simplicity
-    expires_at: datetime
-    revoked: bool = Field(default=False)
+    token_hash: str = Field(max_length=64, unique=True)  # SHA-256 hex, never the raw token
+    user_id: int  # No foreign key for simplicity
+    tenant: str = Field(default="default")  # with user_id, identifies the user across shards
+    expires_at: datetime = Field(index=True)
+    revoked: bool = Field(default=False, index=True)
+    token_version: int = Field(default=0)  # user's token_version at issue time
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class RefreshRequest(BaseModel):
@@ -59,3 +73,28 @@ class PasswordReset(BaseModel):
     """
     token: str
     new_password: str
+
+class IntrospectionRequest(BaseModel):
+    """
+    Model for batch token introspection request
+    """
+    tokens: List[str]
+
+class TokenIntrospection(BaseModel):
+    """
+    Introspection result of one access token; claims only when active
+    """
+    active: bool
+    sub: Optional[str] = None
+    username: Optional[str] = None
+    tid: Optional[str] = None
+    roles: Optional[List[str]] = None  # current roles, which may differ from the token's
+    exp: Optional[int] = None
+    iat: Optional[int] = None
+    cache_seconds: int  # how long the caller may reuse this result
+
+class IntrospectionResponse(BaseModel):
+    """
+    Introspection results, in the order of the requested tokens
+    """
+    results: List[TokenIntrospection]
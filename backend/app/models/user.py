@@ -1,7 +1,10 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, List, Optional
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
-from pydantic import EmailStr
+from pydantic import BaseModel, EmailStr
+
+from backend.app.core.roles import ROLE_USER, mask_to_roles
 
 class UserBase(SQLModel):
     """
@@ -17,9 +20,15 @@ class User(UserBase, table=True):
     """
     Database model for user
     """
+    __table_args__ = (
+        # Keyset pagination walks users of a tenant in id order
+        Index("ix_user_tenant_id", "tenant", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     hashed_password: str
-    roles: str = Field(default="USER")  # Comma-separated roles
+    role_mask: int = Field(default=ROLE_USER)  # Bits from backend.app.core.roles
+    token_version: int = Field(default=0)  # Bumped to revoke every issued token
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -60,7 +69,87 @@ class UserResponse(UserBase):
             full_name=user.full_name,
             disabled=user.disabled,
             tenant=user.tenant,
-            roles=user.roles.split(",") if user.roles else [],
+            roles=mask_to_roles(user.role_mask),
             created_at=user.created_at,
             updated_at=user.updated_at
         )
+
+    @staticmethod
+    def dict_from_orm(user: Any) -> Dict[str, Any]:
+        """
+        The response's fields as plain data, for FastJSONResponse
+
+        Takes a User, a Principal or a row with the user columns. Values come
+        from the database and are not validated again.
+        """
+        return {
+            "username": user.username,
+            "email": user.email,
+            "full_name": user.full_name,
+            "disabled": user.disabled,
+            "tenant": user.tenant,
+            "id": user.id,
+            "roles": mask_to_roles(user.role_mask),
+            "created_at": user.created_at,
+            "updated_at": user.updated_at,
+        }
+
+class UserPage(BaseModel):
+    """
+    Model for a page of users with a cursor to the next page
+    """
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+class BulkUserResult(BaseModel):
+    """
+    Outcome of one row of a bulk user import
+    """
+    index: int
+    status: str  # "created" or "error"
+    username: Optional[str] = None
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkUserReport(BaseModel):
+    """
+    Model for the report of a bulk user import
+    """
+    created: int
+    failed: int
+    results: List[BulkUserResult]
+
+class UserFilter(BaseModel):
+    """
+    Tenant-scoped filter selecting users for bulk changes
+    """
+    role: Optional[str] = None
+    disabled: Optional[bool] = None
+    created_before: Optional[datetime] = None
+    created_after: Optional[datetime] = None
+
+class BulkUserSelection(BaseModel):
+    """
+    Users targeted by a bulk change: explicit ids, a filter, or both
+    """
+    ids: Optional[List[int]] = None
+    filter: Optional[UserFilter] = None
+
+class BulkRolesUpdate(BulkUserSelection):
+    """
+    Model for assigning a role set to many users
+    """
+    roles: List[str]
+
+class BulkDisableUpdate(BulkUserSelection):
+    """
+    Model for disabling or re-enabling many users
+    """
+    disabled: bool = True
+
+class BulkMutationResult(BaseModel):
+    """
+    Model for the outcome of a bulk change
+    """
+    affected: int
+    ids: List[int]
@@ -2,12 +2,20 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Union, Any
 import secrets
 from fastapi import HTTPException, status
-from sqlmodel import Session, select
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from backend.app.models.user import User
-from backend.app.models.token import RefreshToken
-from backend.app.core.security import get_password_hash, verify_password, create_access_token
+from backend.app.core.roles import mask_to_roles
+from backend.app.core.security import create_access_token, hash_refresh_token
 from backend.app.core.config import settings
+from backend.app.core.metrics import LOGINS
+from backend.app.db.database import tenant_router
+from backend.app.db.sharding import UnknownTenantError
+from backend.app.services.hashing import password_hasher
+from backend.app.services.principal_cache import principal_cache
+from backend.app.providers.token_store import token_store
 
 class AuthProvider:
     """
@@ -15,51 +23,74 @@ class AuthProvider:
     """
 
     @staticmethod
-    def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    async def find_user(username: str, tenant: Optional[str] = None) -> Optional[User]:
+        """
+        Look up a user by username, on every shard unless the tenant is known
+        """
+        if tenant is not None:
+            try:
+                shard = await tenant_router.shard_for(tenant)
+            except UnknownTenantError:
+                return None
+            async with shard.session() as db:
+                return (await db.exec(
+                    select(User).where(User.username == username, User.tenant == tenant)
+                )).first()
+
+        # Usernames are unique across shards, so at most one row comes back
+        users = await tenant_router.scatter(select(User).where(User.username == username))
+        return users[0] if users else None
+
+    @staticmethod
+    async def authenticate_user(
+            username: str, password: str, tenant: Optional[str] = None
+    ) -> Optional[User]:
         """
         Authenticate a user by username and password
         """
-        user = db.exec(select(User).where(User.username == username)).first()
+        user = await AuthProvider.find_user(username, tenant)
 
         if not user:
+            LOGINS.labels("unknown_user").inc()
             return None
 
-        if not verify_password(password, user.hashed_password):
+        if not await password_hasher.verify(password, user.hashed_password):
+            LOGINS.labels("invalid_password").inc()
             return None
 
         if user.disabled:
+            LOGINS.labels("disabled").inc()
             return None
 
+        LOGINS.labels("success").inc()
         return user
 
     @staticmethod
-    def create_tokens(db: Session, user: User) -> Dict[str, Any]:
+    async def create_tokens(user: User) -> Dict[str, Any]:
         """
         Create access and refresh tokens for a user
         """
-        # Get user roles
-        roles = user.roles.split(",") if user.roles else []
-
         # Create access token
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
             subject=str(user.id),
             username=user.username,
-            roles=roles,
-            expires_delta=access_token_expires
+            tenant=user.tenant,
+            role_mask=user.role_mask,
+            expires_delta=access_token_expires,
+            version=user.token_version,
         )
 
         # Create refresh token
         refresh_token_value = secrets.token_hex(32)
-        refresh_token = RefreshToken(
-            token=refresh_token_value,
+        await token_store.save(
+            token_hash=hash_refresh_token(refresh_token_value),
             user_id=user.id,
+            token_version=user.token_version,
             expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+            tenant=user.tenant,
         )
 
-        db.add(refresh_token)
-        db.commit()
-
         # Return tokens and user info
         return {
             "access_token": access_token,
@@ -68,76 +99,60 @@ class AuthProvider:
             "token_type": "bearer",
             "user_id": user.id,
             "username": user.username,
-            "roles": roles,
+            "roles": mask_to_roles(user.role_mask),
         }
 
     @staticmethod
-    def refresh_tokens(db: Session, refresh_token: str) -> Optional[Dict[str, Any]]:
+    async def refresh_tokens(refresh_token: str) -> Optional[Dict[str, Any]]:
         """
         Refresh tokens using a refresh token
         """
-        # Find the refresh token
-        token = db.exec(
-            select(RefreshToken).where(
-                RefreshToken.token == refresh_token,
-                RefreshToken.revoked == False,
-                RefreshToken.expires_at > datetime.utcnow(),
-                )
-        ).first()
+        # Find and revoke the refresh token in one step, so it can be used once
+        token = await token_store.consume(hash_refresh_token(refresh_token))
 
         if not token:
             return None
 
-        # Get the user
-        user = db.get(User, token.user_id)
+        # Get the user from the shard of its tenant
+        try:
+            shard = await tenant_router.shard_for(token.tenant)
+        except UnknownTenantError:
+            return None
+        async with shard.session() as db:
+            user = (await db.exec(
+                select(User).where(User.id == token.user_id, User.tenant == token.tenant)
+            )).first()
         if not user or user.disabled:
             return None
 
-        # Revoke the old token
-        token.revoked = True
-        db.add(token)
-        db.commit()
+        # Issued before the user's last "log out everywhere"
+        if token.token_version != user.token_version:
+            return None
 
         # Create new tokens
-        return AuthProvider.create_tokens(db, user)
+        return await AuthProvider.create_tokens(user)
 
     @staticmethod
-    def revoke_token(db: Session, refresh_token: str, user_id: int) -> bool:
+    async def revoke_token(refresh_token: str, tenant: str, user_id: int) -> bool:
         """
         Revoke a refresh token
         """
-        token = db.exec(
-            select(RefreshToken).where(
-                RefreshToken.token == refresh_token,
-                RefreshToken.user_id == user_id,
-                )
-        ).first()
-
-        if not token:
-            return False
-
-        token.revoked = True
-        db.add(token)
-        db.commit()
-
-        return True
+        return await token_store.revoke(hash_refresh_token(refresh_token), tenant, user_id)
 
     @staticmethod
-    def revoke_all_tokens(db: Session, user_id: int) -> bool:
+    async def revoke_all_tokens(db: AsyncSession, tenant: str, user_id: int) -> bool:
         """
-        Revoke all refresh tokens for a user
-        """
-        tokens = db.exec(
-            select(RefreshToken).where(
-                RefreshToken.user_id == user_id,
-                RefreshToken.revoked == False,
-                )
-        ).all()
-
-        for token in tokens:
-            token.revoked = True
-            db.add(token)
+        Revoke all access and refresh tokens for a user
 
-        db.commit()
+        Bumps the user's token_version in a single UPDATE; tokens carrying an
+        older version are rejected when they are next presented.
+        """
+        result = await db.execute(
+            update(User)
+            .where(User.id == user_id, User.tenant == tenant)
+            .values(token_version=User.token_version + 1)
+        )
+        await db.commit()
+        await principal_cache.invalidate(tenant, user_id)
 
-        return True
\ No newline at end of file
+        return result.rowcount > 0
\ No newline at end of file
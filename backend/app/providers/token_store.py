@@ -0,0 +1,341 @@
+import calendar
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, update
+from sqlmodel import select
+
+from backend.app.core.config import settings
+from backend.app.db.database import async_session
+from backend.app.models.token import RefreshToken
+
+# User ids per UPDATE when revoking the tokens of many users
+REVOKE_CHUNK_SIZE = 500
+
+
+@dataclass(frozen=True)
+class StoredRefreshToken:
+    """
+    Refresh token state kept by a token store
+    """
+    user_id: int
+    token_version: int
+    expires_at: datetime
+    tenant: str = "default"
+
+
+class TokenStore(ABC):
+    """
+    Storage backend for refresh tokens, keyed by the token's hash
+    """
+
+    @abstractmethod
+    async def save(
+            self,
+            token_hash: str,
+            user_id: int,
+            token_version: int,
+            expires_at: datetime,
+            tenant: str = "default",
+    ) -> None:
+        """
+        Store a newly issued refresh token
+        """
+
+    @abstractmethod
+    async def consume(self, token_hash: str) -> Optional[StoredRefreshToken]:
+        """
+        Atomically revoke a live token and return it, or None if it cannot be used
+        """
+
+    @abstractmethod
+    async def revoke(self, token_hash: str, tenant: str, user_id: int) -> bool:
+        """
+        Revoke a token belonging to the given user
+
+        User ids are only unique within a shard, so the tenant is part of
+        the owner check.
+        """
+
+    @abstractmethod
+    async def revoke_users(self, tenant: str, user_ids: List[int]) -> None:
+        """
+        Mark every token of the given users as unusable
+
+        Needed when user ids are reassigned (tenant moves), where a bumped
+        token_version cannot tell old tokens apart.
+        """
+
+    async def count(self) -> Optional[int]:
+        """
+        Number of stored tokens, or None when the store cannot tell cheaply
+        """
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLTokenStore(TokenStore):
+    """
+    Refresh tokens in the `refreshtoken` table of the main database
+    """
+
+    async def save(
+            self,
+            token_hash: str,
+            user_id: int,
+            token_version: int,
+            expires_at: datetime,
+            tenant: str = "default",
+    ) -> None:
+        async with async_session() as db:
+            db.add(RefreshToken(
+                token_hash=token_hash,
+                user_id=user_id,
+                tenant=tenant,
+                token_version=token_version,
+                expires_at=expires_at,
+            ))
+            await db.commit()
+
+    async def consume(self, token_hash: str) -> Optional[StoredRefreshToken]:
+        async with async_session() as db:
+            token = (await db.exec(
+                select(RefreshToken).where(
+                    RefreshToken.token_hash == token_hash,
+                    RefreshToken.revoked == False,
+                    RefreshToken.expires_at > datetime.utcnow(),
+                    )
+            )).first()
+
+            if not token:
+                return None
+
+            # Guard against the same token being redeemed concurrently
+            result = await db.execute(
+                update(RefreshToken)
+                .where(RefreshToken.id == token.id, RefreshToken.revoked == False)
+                .values(revoked=True)
+            )
+            await db.commit()
+
+            if result.rowcount != 1:
+                return None
+
+            return StoredRefreshToken(
+                token.user_id, token.token_version, token.expires_at, token.tenant
+            )
+
+    async def revoke(self, token_hash: str, tenant: str, user_id: int) -> bool:
+        async with async_session() as db:
+            result = await db.execute(
+                update(RefreshToken)
+                .where(
+                    RefreshToken.token_hash == token_hash,
+                    RefreshToken.tenant == tenant,
+                    RefreshToken.user_id == user_id,
+                )
+                .values(revoked=True)
+            )
+            await db.commit()
+
+            return result.rowcount > 0
+
+    async def revoke_users(self, tenant: str, user_ids: List[int]) -> None:
+        # Chunked to stay under the bind parameter limit of SQLite
+        async with async_session() as db:
+            for start in range(0, len(user_ids), REVOKE_CHUNK_SIZE):
+                await db.execute(
+                    update(RefreshToken)
+                    .where(
+                        RefreshToken.tenant == tenant,
+                        RefreshToken.user_id.in_(user_ids[start:start + REVOKE_CHUNK_SIZE]),
+                        RefreshToken.revoked == False,
+                    )
+                    .values(revoked=True)
+                )
+            await db.commit()
+
+    async def count(self) -> Optional[int]:
+        # Includes expired and revoked rows the purger has not deleted yet
+        async with async_session() as db:
+            return (await db.exec(select(func.count()).select_from(RefreshToken))).one()
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    Refresh tokens in process memory (single worker deployments and tests)
+    """
+
+    # Expired entries are swept after this many saves
+    SWEEP_INTERVAL = 1000
+
+    def __init__(self) -> None:
+        self._tokens: Dict[str, StoredRefreshToken] = {}
+        self._saves = 0
+
+    async def save(
+            self,
+            token_hash: str,
+            user_id: int,
+            token_version: int,
+            expires_at: datetime,
+            tenant: str = "default",
+    ) -> None:
+        self._tokens[token_hash] = StoredRefreshToken(user_id, token_version, expires_at, tenant)
+
+        self._saves += 1
+        if self._saves % self.SWEEP_INTERVAL == 0:
+            self._sweep()
+
+    async def consume(self, token_hash: str) -> Optional[StoredRefreshToken]:
+        token = self._tokens.pop(token_hash, None)
+        if token is None or token.expires_at <= datetime.utcnow():
+            return None
+        return token
+
+    async def revoke(self, token_hash: str, tenant: str, user_id: int) -> bool:
+        token = self._tokens.get(token_hash)
+        if token is None or (token.tenant, token.user_id) != (tenant, user_id):
+            return False
+
+        del self._tokens[token_hash]
+        return True
+
+    async def revoke_users(self, tenant: str, user_ids: List[int]) -> None:
+        users = set(user_ids)
+        revoked = [
+            key for key, token in self._tokens.items()
+            if token.tenant == tenant and token.user_id in users
+        ]
+        for key in revoked:
+            del self._tokens[key]
+
+    async def count(self) -> Optional[int]:
+        return len(self._tokens)
+
+    def _sweep(self) -> None:
+        now = datetime.utcnow()
+        expired = [key for key, token in self._tokens.items() if token.expires_at <= now]
+        for key in expired:
+            del self._tokens[key]
+
+
+class RedisTokenStore(TokenStore):
+    """
+    Refresh tokens in Redis, expiring through native key TTLs
+
+    Takes any `redis.asyncio`-compatible client, so tests can pass a
+    `fakeredis.aioredis.FakeRedis` instance. Requires Redis 6.2+ for GETDEL.
+    Each user's token hashes are also kept in a set, expiring with the
+    newest token, so all of them can be revoked at once.
+    """
+
+    def __init__(self, client: Any, prefix: str = "refresh:") -> None:
+        self._redis = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "refresh:") -> "RedisTokenStore":
+        from redis import asyncio as redis
+
+        return cls(redis.from_url(url, decode_responses=True), prefix)
+
+    async def save(
+            self,
+            token_hash: str,
+            user_id: int,
+            token_version: int,
+            expires_at: datetime,
+            tenant: str = "default",
+    ) -> None:
+        ttl = int((expires_at - datetime.utcnow()).total_seconds())
+        if ttl <= 0:
+            return
+
+        # Datetimes are naive UTC throughout, so convert with timegm; the tenant
+        # goes last as it may itself contain colons
+        expires = calendar.timegm(expires_at.timetuple())
+        value = f"{user_id}:{token_version}:{expires}:{tenant}"
+        user_key = self._user_key(tenant, user_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.prefix + token_hash, value, ex=ttl)
+            pipe.sadd(user_key, token_hash)
+            # Refresh tokens share one lifetime, so the newest expires last
+            pipe.expire(user_key, ttl)
+            await pipe.execute()
+
+    async def consume(self, token_hash: str) -> Optional[StoredRefreshToken]:
+        value = await self._redis.getdel(self.prefix + token_hash)
+        if value is None:
+            return None
+        return self._decode(value)
+
+    async def revoke(self, token_hash: str, tenant: str, user_id: int) -> bool:
+        key = self.prefix + token_hash
+        value = await self._redis.get(key)
+        if value is None:
+            return False
+        token = self._decode(value)
+        if (token.tenant, token.user_id) != (tenant, user_id):
+            return False
+
+        return await self._redis.delete(key) > 0
+
+    async def revoke_users(self, tenant: str, user_ids: List[int]) -> None:
+        for start in range(0, len(user_ids), REVOKE_CHUNK_SIZE):
+            user_keys = [self._user_key(tenant, user_id) for user_id in user_ids[start:start + REVOKE_CHUNK_SIZE]]
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for user_key in user_keys:
+                    pipe.smembers(user_key)
+                members = await pipe.execute()
+
+            # Hashes of tokens already used or expired are deleted as no-ops
+            keys = [
+                self.prefix + (token_hash.decode() if isinstance(token_hash, bytes) else token_hash)
+                for hashes in members
+                for token_hash in hashes
+            ]
+            await self._redis.delete(*keys, *user_keys)
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+    def _user_key(self, tenant: str, user_id: int) -> str:
+        # Token hashes are hex, so this never collides with a token key
+        return f"{self.prefix}user:{user_id}:{tenant}"
+
+    @staticmethod
+    def _decode(value: Any) -> StoredRefreshToken:
+        if isinstance(value, bytes):
+            value = value.decode()
+        # Values written before sharding have no tenant
+        user_id, token_version, expires_at, *tenant = value.split(":", 3)
+        return StoredRefreshToken(
+            int(user_id),
+            int(token_version),
+            datetime.utcfromtimestamp(int(expires_at)),
+            tenant[0] if tenant else "default",
+        )
+
+
+def create_token_store() -> TokenStore:
+    """
+    Build the token store selected by TOKEN_STORE_BACKEND
+    """
+    backend = settings.TOKEN_STORE_BACKEND
+    if backend == "sql":
+        return SQLTokenStore()
+    if backend == "memory":
+        return MemoryTokenStore()
+    if backend == "redis":
+        if not settings.TOKEN_STORE_REDIS_URL:
+            raise ValueError("TOKEN_STORE_REDIS_URL is required for the redis token store")
+        return RedisTokenStore.from_url(settings.TOKEN_STORE_REDIS_URL)
+    raise ValueError(f"Unknown token store backend: {backend}")
+
+
+token_store = create_token_store()
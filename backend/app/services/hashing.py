@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from backend.app.core.config import settings
+from backend.app.core.metrics import PASSWORD_HASH_SECONDS, PASSWORD_HASH_WAIT_SECONDS
+from backend.app.core.security import get_password_hash, verify_password
+
+logger = logging.getLogger(__name__)
+
+
+def _timed(func: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    """
+    Run a function inside the worker and return its result with the elapsed time
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class _OperationStats:
+    """
+    Latency counters for a single hashing operation
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.run_seconds = 0.0
+        self.max_run_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, run_seconds: float, wait_seconds: float) -> None:
+        self.count += 1
+        self.run_seconds += run_seconds
+        self.max_run_seconds = max(self.max_run_seconds, run_seconds)
+        self.wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        count = self.count or 1
+        return {
+            "count": self.count,
+            "avg_run_ms": self.run_seconds / count * 1000,
+            "max_run_ms": self.max_run_seconds * 1000,
+            "avg_wait_ms": self.wait_seconds / count * 1000,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+        }
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a bounded worker pool
+
+    bcrypt is deliberately slow, so calling it directly from an async handler
+    blocks the event loop. Jobs are handed to a thread or process pool and at
+    most `max_concurrency` of them are in flight; the rest wait in a queue.
+    """
+
+    def __init__(
+            self,
+            mode: str = "thread",
+            max_workers: Optional[int] = None,
+            max_concurrency: Optional[int] = None,
+    ) -> None:
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {mode}")
+
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.max_workers
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiting = 0
+        self._running = 0
+        self._stats = {"hash": _OperationStats(), "verify": _OperationStats()}
+
+    def start(self) -> None:
+        """
+        Create the worker pool
+        """
+        if self._executor is not None:
+            return
+
+        if self.mode == "process":
+            # Spawned workers avoid forking a process that is running an event loop
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hash",
+            )
+
+        logger.info(
+            f"Password hashing pool started ({self.mode}, "
+            f"workers={self.max_workers}, max_concurrency={self.max_concurrency})"
+        )
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker pool, waiting for running jobs to finish
+        """
+        if self._executor is None:
+            return
+
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password without blocking the event loop
+        """
+        return await self._run("hash", get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        Verify a password against a hash without blocking the event loop
+        """
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Current queue depth and per-operation latency
+        """
+        return {
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self._waiting,
+            "in_flight": self._running,
+            "hash": self._stats["hash"].as_dict(),
+            "verify": self._stats["verify"].as_dict(),
+        }
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives are bound to the loop they are first used on
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _run(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        self.start()
+        semaphore = self._get_semaphore()
+        loop = asyncio.get_running_loop()
+
+        queued_at = time.perf_counter()
+        self._waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._running += 1
+        try:
+            result, run_seconds = await loop.run_in_executor(
+                self._executor, _timed, func, *args
+            )
+        finally:
+            self._running -= 1
+            semaphore.release()
+
+        # Wait time covers both the semaphore queue and the executor hand-off
+        wait_seconds = max((time.perf_counter() - queued_at) - run_seconds, 0.0)
+        self._stats[operation].record(run_seconds, wait_seconds)
+        PASSWORD_HASH_SECONDS.labels(operation).observe(run_seconds)
+        PASSWORD_HASH_WAIT_SECONDS.labels(operation).observe(wait_seconds)
+        return result
+
+
+password_hasher = PasswordHasher(
+    mode=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+)
@@ -0,0 +1,90 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from jose import JWTError
+from pydantic import ValidationError
+
+from backend.app.core.config import settings
+from backend.app.core.roles import mask_to_roles
+from backend.app.core.security import decode_access_token
+from backend.app.db.database import tenant_router
+from backend.app.db.sharding import Shard, UnknownTenantError
+from backend.app.models.token import TokenIntrospection, TokenPayload
+from backend.app.services.principal_cache import Principal, PrincipalKey, principal_cache
+
+
+async def _load_principals(keys: Set[PrincipalKey]) -> Dict[PrincipalKey, Principal]:
+    """
+    Principals for the given users, with at most one query per shard
+
+    Users of tenants that were never placed do not exist.
+    """
+    by_shard: Dict[Shard, Set[PrincipalKey]] = defaultdict(set)
+    for key in keys:
+        try:
+            by_shard[await tenant_router.shard_for(key[0])].add(key)
+        except UnknownTenantError:
+            pass
+
+    async def load(shard: Shard, shard_keys: Set[PrincipalKey]) -> Dict[PrincipalKey, Principal]:
+        # Users changed moments ago are read from the primary, like get_read_db does
+        sticky = next((key for key in shard_keys if shard.read.is_sticky(key)), None)
+        async with await shard.read.open_session(sticky) as db:
+            return await principal_cache.load_many(db, shard_keys)
+
+    found: Dict[PrincipalKey, Principal] = {}
+    for principals in await asyncio.gather(*(load(*item) for item in by_shard.items())):
+        found.update(principals)
+    return found
+
+
+def _inactive() -> TokenIntrospection:
+    return TokenIntrospection(active=False, cache_seconds=settings.INTROSPECTION_CACHE_SECONDS)
+
+
+async def introspect_tokens(tokens: List[str]) -> List[TokenIntrospection]:
+    """
+    Check many access tokens at once, in the order given
+
+    A token is active when its signature and expiry verify and its user
+    exists, is enabled and has not revoked it with "log out everywhere".
+    Results may be reused for `cache_seconds`, which never runs past the
+    token's exp, so revocations reach callers within INTROSPECTION_CACHE_SECONDS.
+    """
+    payloads: List[Optional[TokenPayload]] = []
+    for token in tokens:
+        try:
+            payloads.append(decode_access_token(token))
+        except (JWTError, ValidationError, ValueError):
+            payloads.append(None)
+
+    principals = await _load_principals({
+        (payload.tid, int(payload.sub)) for payload in payloads if payload is not None
+    })
+
+    now = time.time()
+    results = []
+    for payload in payloads:
+        principal = principals.get((payload.tid, int(payload.sub))) if payload else None
+        if (
+            principal is None
+            or principal.disabled
+            or principal.token_version != payload.ver
+        ):
+            results.append(_inactive())
+            continue
+
+        exp = int(payload.exp.timestamp())
+        results.append(TokenIntrospection(
+            active=True,
+            sub=payload.sub,
+            username=principal.username,
+            tid=payload.tid,
+            roles=mask_to_roles(principal.role_mask),
+            exp=exp,
+            iat=int(payload.iat.timestamp()),
+            cache_seconds=max(min(exp - int(now), settings.INTROSPECTION_CACHE_SECONDS), 0),
+        ))
+    return results
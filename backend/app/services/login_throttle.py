@@ -0,0 +1,280 @@
+import logging
+import math
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from backend.app.core.config import settings
+from backend.app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+THROTTLED = metrics.counter(
+    "auth_throttled_total",
+    "Login and refresh attempts rejected before any lookup or hashing",
+    ("endpoint", "limit"),
+)
+
+
+@dataclass(frozen=True)
+class Limit:
+    """
+    At most `attempts` hits per key in any `window_seconds`
+    """
+    name: str
+    attempts: int
+    window_seconds: float
+
+
+class LoginThrottled(Exception):
+    """
+    Raised when a login or refresh attempt exceeds a limit
+    """
+
+    def __init__(self, limit: Limit, retry_after: float) -> None:
+        self.limit = limit
+        self.retry_after = retry_after
+        super().__init__(f"{limit.name} limit exceeded, retry in {retry_after:.0f}s")
+
+
+def _weighted(previous: int, current: int, elapsed: float, window: float) -> float:
+    # Sliding window approximation: the previous window counts for the part
+    # of it still inside the last `window` seconds
+    return previous * (1 - elapsed / window) + current
+
+
+def _retry_after(previous: int, current: int, elapsed: float, limit: Limit) -> float:
+    """
+    Seconds until one more hit fits under the limit, assuming no other hits
+    """
+    window = limit.window_seconds
+    spare = limit.attempts - current - 1
+    if spare > 0 and previous:
+        # Solve previous * (1 - t / window) + current + 1 <= attempts for t
+        return max(window * (1 - spare / previous) - elapsed, 0.0)
+
+    # Wait for the next window, where this window's hits become the previous ones
+    wait = window - elapsed
+    if current > limit.attempts - 1:
+        wait += window * (1 - (limit.attempts - 1) / current)
+    return wait
+
+
+class RateLimiter(ABC):
+    """
+    Counts hits per key with a sliding window counter
+    """
+
+    name = ""
+
+    @abstractmethod
+    async def hit(self, limit: Limit, key: str) -> float:
+        """
+        Record a hit and return 0, or the seconds to wait when over the limit
+
+        Rejected hits are not counted, so a throttled client regains access
+        once its earlier attempts age out however often it keeps trying.
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+    async def close(self) -> None:
+        pass
+
+
+class _Shard:
+    __slots__ = ("lock", "windows")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # key -> [window index, count in that window, count in the one before]
+        self.windows: "OrderedDict[str, List[int]]" = OrderedDict()
+
+
+class MemoryRateLimiter(RateLimiter):
+    """
+    Per-process counters split over independently locked shards
+
+    Each shard keeps at most `max_keys / shards` keys and drops the least
+    recently used one when full, which only ever forgets old attempts.
+    """
+
+    name = "memory"
+
+    def __init__(self, shards: int = 16, max_keys: int = 100000) -> None:
+        self._shards = [_Shard() for _ in range(max(shards, 1))]
+        self._max_keys_per_shard = max(max_keys // len(self._shards), 1)
+
+    async def hit(self, limit: Limit, key: str) -> float:
+        return self.hit_now(limit, key, time.time())
+
+    def hit_now(self, limit: Limit, key: str, now: float) -> float:
+        full_key = f"{limit.name}:{key}"
+        shard = self._shards[zlib.crc32(full_key.encode()) % len(self._shards)]
+        window_index = int(now // limit.window_seconds)
+        elapsed = now - window_index * limit.window_seconds
+
+        with shard.lock:
+            state = shard.windows.get(full_key)
+            if state is None or state[0] < window_index - 1:
+                state = [window_index, 0, 0]
+            elif state[0] == window_index - 1:
+                state = [window_index, 0, state[1]]
+
+            _, current, previous = state
+            if _weighted(previous, current + 1, elapsed, limit.window_seconds) > limit.attempts:
+                return _retry_after(previous, current, elapsed, limit)
+
+            state[1] += 1
+            shard.windows[full_key] = state
+            shard.windows.move_to_end(full_key)
+            if len(shard.windows) > self._max_keys_per_shard:
+                shard.windows.popitem(last=False)
+            return 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "keys": sum(len(shard.windows) for shard in self._shards)}
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    Counters shared by all workers through Redis (requires the `redis` extra)
+
+    Takes any `redis.asyncio`-compatible client. When Redis cannot be
+    reached, hits are counted by the per-process `fallback` instead.
+    """
+
+    name = "redis"
+
+    def __init__(self, client: Any, fallback: RateLimiter, prefix: str = "throttle:") -> None:
+        self._redis = client
+        self._fallback = fallback
+        self._prefix = prefix
+        self.errors = 0
+        self._unavailable: Tuple[Type[Exception], ...] = (OSError,)
+        try:
+            from redis.exceptions import RedisError
+            self._unavailable += (RedisError,)
+        except ImportError:
+            pass
+
+    @classmethod
+    def from_url(cls, url: str, fallback: RateLimiter, prefix: str = "throttle:") -> "RedisRateLimiter":
+        from redis import asyncio as redis
+
+        return cls(redis.from_url(url, decode_responses=True), fallback, prefix)
+
+    async def hit(self, limit: Limit, key: str) -> float:
+        now = time.time()
+        window_index = int(now // limit.window_seconds)
+        elapsed = now - window_index * limit.window_seconds
+        base = f"{self._prefix}{limit.name}:{key}:"
+        current_key = f"{base}{window_index}"
+
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.incr(current_key)
+                pipe.expire(current_key, math.ceil(limit.window_seconds * 2))
+                pipe.get(f"{base}{window_index - 1}")
+                current, _, previous = await pipe.execute()
+
+            current, previous = int(current), int(previous or 0)
+            if _weighted(previous, current, elapsed, limit.window_seconds) <= limit.attempts:
+                return 0.0
+
+            # Take the rejected hit back out of the count
+            await self._redis.decr(current_key)
+            return _retry_after(previous, current - 1, elapsed, limit)
+        except self._unavailable as e:
+            self.errors += 1
+            logger.warning(f"Rate limit store unavailable, counting locally: {str(e)}")
+            return await self._fallback.hit(limit, key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "errors": self.errors, "fallback": self._fallback.stats()}
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+class LoginThrottle:
+    """
+    Rejects login and refresh attempts before any lookup or bcrypt work
+
+    Logins are limited per username, which slows password guessing against
+    one account, and per client address, which sheds clients spraying many
+    usernames. Refreshes are limited per address.
+    """
+
+    def __init__(
+            self,
+            limiter: RateLimiter,
+            username_limit: Limit,
+            ip_limit: Limit,
+            refresh_limit: Limit,
+            enabled: bool = True,
+    ) -> None:
+        self.limiter = limiter
+        self.username_limit = username_limit
+        self.ip_limit = ip_limit
+        self.refresh_limit = refresh_limit
+        self.enabled = enabled
+
+    async def check_login(self, username: str, client_ip: Optional[str]) -> None:
+        """
+        Raise LoginThrottled when the address or the username is over its limit
+        """
+        if not self.enabled:
+            return
+        # The address goes first so a blocked client cannot use up a victim's budget
+        await self._check("login", self.ip_limit, client_ip or "unknown")
+        await self._check("login", self.username_limit, username)
+
+    async def check_refresh(self, client_ip: Optional[str]) -> None:
+        """
+        Raise LoginThrottled when the address is over the refresh limit
+        """
+        if not self.enabled:
+            return
+        await self._check("refresh", self.refresh_limit, client_ip or "unknown")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, **self.limiter.stats()}
+
+    async def close(self) -> None:
+        await self.limiter.close()
+
+    async def _check(self, endpoint: str, limit: Limit, key: str) -> None:
+        retry_after = await self.limiter.hit(limit, key)
+        if retry_after > 0:
+            THROTTLED.labels(endpoint, limit.name).inc()
+            raise LoginThrottled(limit, retry_after)
+
+
+def create_login_throttle() -> LoginThrottle:
+    """
+    Build the throttle from the LOGIN_THROTTLE_* settings
+    """
+    limiter: RateLimiter = MemoryRateLimiter(
+        shards=settings.LOGIN_THROTTLE_SHARDS,
+        max_keys=settings.LOGIN_THROTTLE_MAX_KEYS,
+    )
+    if settings.LOGIN_THROTTLE_REDIS_URL:
+        limiter = RedisRateLimiter.from_url(settings.LOGIN_THROTTLE_REDIS_URL, fallback=limiter)
+
+    window = settings.LOGIN_THROTTLE_WINDOW_SECONDS
+    return LoginThrottle(
+        limiter,
+        username_limit=Limit("username", settings.LOGIN_THROTTLE_USERNAME_ATTEMPTS, window),
+        ip_limit=Limit("ip", settings.LOGIN_THROTTLE_IP_ATTEMPTS, window),
+        refresh_limit=Limit("refresh_ip", settings.REFRESH_THROTTLE_IP_ATTEMPTS, window),
+        enabled=settings.LOGIN_THROTTLE_ENABLED,
+    )
+
+
+login_throttle = create_login_throttle()
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.app.core.cache import TTLCache
+from backend.app.core.config import settings
+from backend.app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Message used to drop every cached principal
+INVALIDATE_ALL = "*"
+
+# Principals are cached per (tenant, user id)
+PrincipalKey = Tuple[str, int]
+
+# Invalidations larger than this flush the whole cache with one message
+BULK_INVALIDATION_THRESHOLD = 1000
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Authenticated user state needed by request handlers (no secrets)
+    """
+    id: int
+    username: str
+    email: str
+    full_name: Optional[str]
+    disabled: bool
+    tenant: str
+    role_mask: int
+    token_version: int
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            disabled=user.disabled,
+            tenant=user.tenant,
+            role_mask=user.role_mask,
+            token_version=user.token_version,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+
+class InvalidationChannel(ABC):
+    """
+    Broadcasts principal invalidations to the other workers
+    """
+
+    @abstractmethod
+    async def publish(self, message: str) -> None:
+        ...
+
+    @abstractmethod
+    async def listen(self, callback: Callable[[str], None]) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisInvalidationChannel(InvalidationChannel):
+    """
+    Invalidation channel over Redis pub/sub (requires the `redis` extra)
+    """
+
+    def __init__(self, url: str, channel: str = "principal-invalidation") -> None:
+        from redis import asyncio as redis
+
+        self.channel = channel
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    async def publish(self, message: str) -> None:
+        await self._redis.publish(self.channel, message)
+
+    async def listen(self, callback: Callable[[str], None]) -> None:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    callback(message["data"])
+        finally:
+            await pubsub.unsubscribe(self.channel)
+            await pubsub.close()
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+class PrincipalCache:
+    """
+    In-process TTL/LRU cache of principals keyed by (tenant, user id)
+
+    Writers call `invalidate` after committing. The invalidation is applied
+    locally and, when a channel is configured, published to other workers.
+    """
+
+    def __init__(
+            self,
+            max_size: int,
+            ttl_seconds: float,
+            channel: Optional[InvalidationChannel] = None,
+    ) -> None:
+        self._cache: TTLCache[Principal] = TTLCache(max_size, ttl_seconds)
+        self._channel = channel
+        self._listener: Optional[asyncio.Task] = None
+        self._callbacks: List[Callable[[Optional[PrincipalKey]], None]] = []
+        # Bumped on every invalidation so in-flight loads cannot store stale rows
+        self.generation = 0
+
+    def get(self, tenant: str, user_id: int) -> Optional[Principal]:
+        return self._cache.get((tenant, user_id))
+
+    async def load(self, db: AsyncSession, tenant: str, user_id: int) -> Optional[Principal]:
+        """
+        Return a cached principal, loading and caching the user row on a miss
+
+        `db` must be a session on the tenant's shard. User ids are only
+        unique within a shard, hence the tenant in the key.
+        """
+        principal = self._cache.get((tenant, user_id))
+        if principal is not None:
+            return principal
+
+        generation = self.generation
+        user = (await db.exec(
+            select(User).where(User.id == user_id, User.tenant == tenant)
+        )).first()
+        if not user:
+            return None
+
+        principal = Principal.from_user(user)
+        self.set(principal, generation)
+        return principal
+
+    async def load_many(self, db: AsyncSession, keys: Iterable[PrincipalKey]) -> Dict[PrincipalKey, Principal]:
+        """
+        Principals for many users of one shard, loading all misses with one query
+
+        Users that do not exist are missing from the result.
+        """
+        found: Dict[PrincipalKey, Principal] = {}
+        missing: Set[PrincipalKey] = set()
+        for key in keys:
+            principal = self._cache.get(key)
+            if principal is not None:
+                found[key] = principal
+            else:
+                missing.add(key)
+        if not missing:
+            return found
+
+        generation = self.generation
+        # Ids repeat across tenants, so rows of other requested tenants are filtered out
+        users = (await db.exec(
+            select(User).where(
+                User.id.in_({user_id for _, user_id in missing}),
+                User.tenant.in_({tenant for tenant, _ in missing}),
+            )
+        )).all()
+        for user in users:
+            key = (user.tenant, user.id)
+            if key in missing:
+                found[key] = principal = Principal.from_user(user)
+                self.set(principal, generation)
+        return found
+
+    def set(self, principal: Principal, generation: int) -> None:
+        """
+        Store a principal loaded while `generation` was current
+        """
+        if generation == self.generation:
+            self._cache.set((principal.tenant, principal.id), principal)
+
+    async def invalidate(self, tenant: str, *user_ids: int) -> None:
+        """
+        Drop principals of a tenant after their user rows changed
+        """
+        if len(user_ids) > BULK_INVALIDATION_THRESHOLD:
+            messages = [INVALIDATE_ALL]
+        else:
+            # The tenant goes last as it may itself contain colons
+            messages = [f"{user_id}:{tenant}" for user_id in user_ids]
+
+        for message in messages:
+            self._apply(message)
+
+        if self._channel is not None:
+            for message in messages:
+                try:
+                    await self._channel.publish(message)
+                except Exception as e:
+                    logger.error(f"Error publishing principal invalidation: {str(e)}")
+
+    def add_listener(self, callback: Callable[[Optional[PrincipalKey]], None]) -> None:
+        """
+        Call `callback` with every invalidated key, local or remote (None: all)
+        """
+        self._callbacks.append(callback)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    async def start(self) -> None:
+        """
+        Start listening for invalidations from other workers
+        """
+        if self._channel is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+        if self._channel is not None:
+            await self._channel.close()
+
+    def _apply(self, message: str) -> None:
+        self.generation += 1
+        if message == INVALIDATE_ALL:
+            key = None
+            self._cache.clear()
+        else:
+            user_id, tenant = message.split(":", 1)
+            key = (tenant, int(user_id))
+            self._cache.delete(key)
+
+        for callback in self._callbacks:
+            callback(key)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                await self._channel.listen(self._apply)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Principal invalidation channel failed: {str(e)}")
+
+            # Messages may have been missed while disconnected
+            self._apply(INVALIDATE_ALL)
+            await asyncio.sleep(1)
+
+
+def _create_channel() -> Optional[InvalidationChannel]:
+    if settings.PRINCIPAL_CACHE_REDIS_URL:
+        return RedisInvalidationChannel(settings.PRINCIPAL_CACHE_REDIS_URL)
+    return None
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    channel=_create_channel(),
+)
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import delete, func, insert, select
+
+from backend.app.db.sharding import Shard, TenantRouter
+from backend.app.models.tenant import TenantPlacement
+from backend.app.models.user import User
+from backend.app.providers.token_store import token_store
+from backend.app.services.principal_cache import principal_cache
+from backend.app.services.tenant_version import bump_tenant_version, get_tenant_version
+
+logger = logging.getLogger(__name__)
+
+# Rows per statement when copying and deleting a tenant's users
+MOVE_CHUNK_SIZE = 500
+
+
+class TenantMover:
+    """
+    Moves a tenant's users from one shard to another
+
+    The tenant is first marked as moving, which makes workers refuse writes
+    for it once they reload placements. Its users are then copied, the
+    placement is switched and, after workers have picked up the new shard,
+    the rows are deleted from the old one. User ids are kept unless they
+    collide on the target, in which case every moved user gets a fresh id
+    and has to log in again.
+    """
+
+    def __init__(self, router: TenantRouter, settle_seconds: float) -> None:
+        self.router = router
+        # How long workers need to notice a placement change
+        self.settle_seconds = settle_seconds
+
+    async def move(self, tenant: str, target_name: str) -> Dict[str, Any]:
+        """
+        Move a tenant to `target_name` and return a summary
+        """
+        if target_name not in self.router.shards:
+            raise ValueError(f"Unknown shard: {target_name}")
+
+        # Tenants that already have users must not be placed by hashing here
+        await self.router.seed_placements()
+        source = await self.router.place(tenant)
+        target = self.router.shards[target_name]
+        if source is target:
+            return {"tenant": tenant, "shard": target_name, "moved": 0, "ids_reassigned": False}
+
+        await self._set_placement(tenant, source.name, moving=True)
+        await asyncio.sleep(self.settle_seconds)
+
+        try:
+            rows = await self._read_users(source, tenant)
+            old_ids = [row["id"] for row in rows]
+            reassigned = await self._assign_ids(source, target, rows)
+            async with source.session() as db:
+                version = await get_tenant_version(db, tenant)
+            await self._insert_users(target, tenant, rows, version)
+        except Exception:
+            await self._delete_users(target, tenant)
+            await self._set_placement(tenant, source.name, moving=False)
+            raise
+
+        await self._set_placement(tenant, target.name, moving=False)
+        if reassigned:
+            # Old tokens carry ids that no longer exist for this tenant
+            await token_store.revoke_users(tenant, old_ids)
+        await principal_cache.invalidate(tenant, *old_ids)
+
+        # Let workers stop reading the old shard before its rows disappear
+        await asyncio.sleep(self.settle_seconds)
+        await self._delete_users(source, tenant)
+
+        logger.info(f"Moved tenant {tenant} from {source.name} to {target.name} ({len(rows)} users)")
+        return {
+            "tenant": tenant,
+            "shard": target.name,
+            "moved": len(rows),
+            "ids_reassigned": reassigned,
+        }
+
+    async def _set_placement(self, tenant: str, shard: str, moving: bool) -> None:
+        async with self.router.default.session() as db:
+            placement = await db.get(TenantPlacement, tenant)
+            if placement is None:
+                placement = TenantPlacement(tenant=tenant, shard=shard)
+            placement.shard = shard
+            placement.moving = moving
+            placement.updated_at = datetime.utcnow()
+            db.add(placement)
+            await db.commit()
+        await self.router.load_placements()
+
+    @staticmethod
+    async def _read_users(shard: Shard, tenant: str) -> List[Dict[str, Any]]:
+        async with shard.session() as db:
+            result = await db.execute(
+                select(User.__table__).where(User.tenant == tenant).order_by(User.id)
+            )
+            return [dict(row) for row in result.mappings()]
+
+    @staticmethod
+    async def _assign_ids(source: Shard, target: Shard, rows: List[Dict[str, Any]]) -> bool:
+        ids = [row["id"] for row in rows]
+        async with target.session() as db:
+            taken = False
+            for start in range(0, len(ids), MOVE_CHUNK_SIZE):
+                chunk = ids[start:start + MOVE_CHUNK_SIZE]
+                if (await db.execute(select(User.id).where(User.id.in_(chunk)).limit(1))).first():
+                    taken = True
+                    break
+            if not taken:
+                return False
+            target_max = (await db.execute(select(func.max(User.id)))).scalar() or 0
+
+        async with source.session() as db:
+            source_max = (await db.execute(select(func.max(User.id)))).scalar() or 0
+
+        # Fresh ids were never used by this tenant, so old tokens cannot match them
+        next_id = max(source_max, target_max) + 1
+        for offset, row in enumerate(rows):
+            row["id"] = next_id + offset
+        return True
+
+    @staticmethod
+    async def _insert_users(shard: Shard, tenant: str, rows: List[Dict[str, Any]], version: int) -> None:
+        if not rows:
+            return
+
+        async with shard.session() as db:
+            # Continue past the source's version so ETags from either shard never collide
+            await bump_tenant_version(db, tenant, at_least=version + 1)
+            for start in range(0, len(rows), MOVE_CHUNK_SIZE):
+                await db.execute(insert(User.__table__), rows[start:start + MOVE_CHUNK_SIZE])
+            if shard.engine.dialect.name == "postgresql":
+                # Explicit ids do not advance the serial sequence
+                await db.execute(
+                    select(func.setval(
+                        func.pg_get_serial_sequence('"user"', "id"),
+                        select(func.max(User.id)).scalar_subquery(),
+                    ))
+                )
+            await db.commit()
+
+    @staticmethod
+    async def _delete_users(shard: Shard, tenant: str) -> None:
+        async with shard.session() as db:
+            while True:
+                ids = (await db.execute(
+                    select(User.id).where(User.tenant == tenant).limit(MOVE_CHUNK_SIZE)
+                )).scalars().all()
+                if not ids:
+                    break
+                await db.execute(
+                    delete(User)
+                    .where(User.id.in_(ids))
+                    .execution_options(synchronize_session=False)
+                )
+                await bump_tenant_version(db, tenant)
+                await db.commit()
@@ -0,0 +1,40 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.app.models.tenant import TenantVersion
+
+
+async def bump_tenant_version(db: AsyncSession, tenant: str, at_least: int = 0) -> None:
+    """
+    Bump the tenant's user version in the session's transaction
+
+    Call it before committing any insert, update or delete of the tenant's
+    users. `at_least` carries the version over when a tenant moves shards,
+    so the new shard never repeats a version clients have already seen.
+    """
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    await db.execute(
+        dialect.insert(TenantVersion.__table__)
+        .values(tenant=tenant, version=max(at_least, 1))
+        .on_conflict_do_update(
+            index_elements=["tenant"],
+            set_={"version": TenantVersion.__table__.c.version + 1},
+        )
+    )
+    if at_least:
+        await db.execute(
+            update(TenantVersion)
+            .where(TenantVersion.tenant == tenant, TenantVersion.version < at_least)
+            .values(version=at_least)
+        )
+
+
+async def get_tenant_version(db: AsyncSession, tenant: str) -> int:
+    """
+    Current user version of a tenant; 0 before its users first change
+    """
+    version = (await db.exec(
+        select(TenantVersion.version).where(TenantVersion.tenant == tenant)
+    )).first()
+    return version or 0
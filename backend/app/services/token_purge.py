@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from backend.app.core.config import settings
+from backend.app.models.token import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshTokenPurger:
+    """
+    Background job that deletes expired and revoked refresh tokens
+
+    Rows are deleted in batches of `batch_size`, each in its own short
+    transaction with a pause in between, so the table is never locked for
+    longer than one batch. Only workers with `enabled` run the schedule;
+    the job is needed once per database, not once per worker.
+    """
+
+    def __init__(
+            self,
+            interval_seconds: float,
+            batch_size: int,
+            batch_pause_seconds: float,
+            enabled: bool = True,
+    ) -> None:
+        self.enabled = enabled
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.batch_pause_seconds = batch_pause_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._stats: Dict[str, Any] = {
+            "enabled": enabled,
+            "runs": 0,
+            "deleted_total": 0,
+            "last_run_at": None,
+            "last_run_deleted": 0,
+            "last_run_seconds": 0.0,
+            "last_run_batches": 0,
+            "max_batch_seconds": 0.0,
+            "last_error": None,
+        }
+
+    async def purge(self, engine: AsyncEngine) -> int:
+        """
+        Delete all purgeable rows in bounded batches and return the count
+        """
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        deleted = 0
+        batches = 0
+
+        # Expired rows are found through the expires_at index, revoked rows
+        # through the revoked index
+        for condition in (RefreshToken.expires_at <= now, RefreshToken.revoked == True):
+            while True:
+                batch_started = time.perf_counter()
+                ids = (
+                    select(RefreshToken.id)
+                    .where(condition)
+                    .limit(self.batch_size)
+                    .scalar_subquery()
+                )
+                async with engine.begin() as conn:
+                    result = await conn.execute(
+                        delete(RefreshToken).where(RefreshToken.id.in_(ids))
+                    )
+
+                batches += 1
+                deleted += result.rowcount
+                self._stats["max_batch_seconds"] = max(
+                    self._stats["max_batch_seconds"], time.perf_counter() - batch_started
+                )
+
+                if result.rowcount < self.batch_size:
+                    break
+                await asyncio.sleep(self.batch_pause_seconds)
+
+        self._stats["runs"] += 1
+        self._stats["deleted_total"] += deleted
+        self._stats["last_run_at"] = now.isoformat()
+        self._stats["last_run_deleted"] = deleted
+        self._stats["last_run_seconds"] = time.perf_counter() - started
+        self._stats["last_run_batches"] = batches
+        self._stats["last_error"] = None
+
+        logger.info(f"Purged {deleted} refresh tokens in {batches} batches")
+        return deleted
+
+    def start(self, engine: AsyncEngine) -> None:
+        """
+        Schedule the purge to run every `interval_seconds`
+        """
+        if self.enabled and self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(engine))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+    async def _run(self, engine: AsyncEngine) -> None:
+        while True:
+            try:
+                await self.purge(engine)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["last_error"] = str(e)
+                logger.error(f"Error purging refresh tokens: {str(e)}")
+
+            await asyncio.sleep(self.interval_seconds)
+
+
+refresh_token_purger = RefreshTokenPurger(
+    enabled=settings.REFRESH_TOKEN_PURGE_ENABLED,
+    interval_seconds=settings.REFRESH_TOKEN_PURGE_INTERVAL_SECONDS,
+    batch_size=settings.REFRESH_TOKEN_PURGE_BATCH_SIZE,
+    batch_pause_seconds=settings.REFRESH_TOKEN_PURGE_BATCH_PAUSE_SECONDS,
+)
@@ -0,0 +1,95 @@
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import and_, delete, select, update
+from sqlalchemy.sql.elements import ColumnElement
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.app.core.roles import roles_to_mask
+from backend.app.models.user import BulkUserSelection, User
+from backend.app.providers.token_store import token_store
+from backend.app.services.principal_cache import principal_cache
+from backend.app.services.tenant_version import bump_tenant_version
+
+
+def selection_condition(
+        selection: BulkUserSelection, tenant: str, exclude_id: int
+) -> ColumnElement:
+    """
+    WHERE clause for the users of a tenant matched by a bulk selection
+
+    The acting user is always excluded so admins cannot lock themselves out.
+    """
+    conditions = [User.tenant == tenant, User.id != exclude_id]
+
+    if selection.ids is not None:
+        conditions.append(User.id.in_(selection.ids))
+
+    if selection.filter is not None:
+        user_filter = selection.filter
+        if user_filter.role is not None:
+            role_bit = roles_to_mask([user_filter.role])
+            conditions.append(User.role_mask.op("&")(role_bit) != 0)
+        if user_filter.disabled is not None:
+            conditions.append(User.disabled == user_filter.disabled)
+        if user_filter.created_before is not None:
+            conditions.append(User.created_at < user_filter.created_before)
+        if user_filter.created_after is not None:
+            conditions.append(User.created_at > user_filter.created_after)
+
+    return and_(*conditions)
+
+
+async def bulk_update_users(
+        db: AsyncSession, tenant: str, condition: ColumnElement, values: Dict[str, Any]
+) -> List[int]:
+    """
+    Apply `values` to every matched user of a tenant and revoke their tokens
+    """
+    ids = list((await db.execute(select(User.id).where(condition))).scalars())
+    if not ids:
+        return ids
+
+    await db.execute(
+        update(User)
+        .where(condition)
+        .values(
+            **values,
+            token_version=User.token_version + 1,
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await bump_tenant_version(db, tenant)
+    await db.commit()
+    await _after_change(tenant, ids)
+
+    return ids
+
+
+async def bulk_delete_users(db: AsyncSession, tenant: str, condition: ColumnElement) -> List[int]:
+    """
+    Delete every matched user of a tenant and revoke their tokens
+    """
+    ids = list((await db.execute(select(User.id).where(condition))).scalars())
+    if not ids:
+        return ids
+
+    await db.execute(
+        delete(User)
+        .where(condition)
+        .execution_options(synchronize_session=False)
+    )
+    await bump_tenant_version(db, tenant)
+    await db.commit()
+    await _after_change(tenant, ids)
+
+    return ids
+
+
+async def _after_change(tenant: str, ids: List[int]) -> None:
+    await principal_cache.invalidate(tenant, *ids)
+    # The bumped token_version (or deleted row) already rejects their tokens;
+    # stores that keep rows also mark them so the purge job reclaims them.
+    # They live in the default shard, so this is a separate transaction
+    await token_store.revoke_users(tenant, ids)
@@ -0,0 +1,174 @@
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.app.core.roles import ROLE_USER
+from backend.app.db.database import tenant_router
+from backend.app.models.user import BulkUserReport, BulkUserResult, User, UserCreate
+from backend.app.services.hashing import password_hasher
+from backend.app.services.tenant_version import bump_tenant_version
+
+
+class UserImporter:
+    """
+    Creates users in bulk for one tenant
+
+    Rows are processed in chunks: uniqueness is checked with one `IN` query
+    per column, passwords are hashed concurrently on the hashing pool and
+    each chunk is inserted with a single executemany and its own commit.
+    """
+
+    def __init__(self, db: AsyncSession, tenant: str, chunk_size: int = 1000) -> None:
+        self.db = db
+        self.tenant = tenant
+        self.chunk_size = chunk_size
+        self.results: List[BulkUserResult] = []
+        # Values claimed by earlier rows of this import
+        self._usernames: Set[str] = set()
+        self._emails: Set[str] = set()
+
+    async def run(self, rows: AsyncIterator[Any]) -> BulkUserReport:
+        """
+        Import every row and return the per-row report
+        """
+        chunk: List[Tuple[int, Any]] = []
+        index = 0
+        async for row in rows:
+            chunk.append((index, row))
+            index += 1
+            if len(chunk) >= self.chunk_size:
+                await self._import_chunk(chunk)
+                chunk = []
+
+        if chunk:
+            await self._import_chunk(chunk)
+
+        self.results.sort(key=lambda result: result.index)
+        created = sum(1 for result in self.results if result.status == "created")
+        return BulkUserReport(
+            created=created,
+            failed=len(self.results) - created,
+            results=self.results,
+        )
+
+    async def _import_chunk(self, chunk: List[Tuple[int, Any]]) -> None:
+        # Validate rows and drop duplicates within the import
+        candidates: List[Tuple[int, UserCreate]] = []
+        for index, row in chunk:
+            try:
+                user_in = UserCreate(**row) if isinstance(row, dict) else None
+            except ValidationError as e:
+                self._fail(index, row.get("username"), str(e))
+                continue
+
+            if user_in is None:
+                self._fail(index, None, "Row must be a JSON object")
+            elif user_in.username in self._usernames:
+                self._fail(index, user_in.username, "Duplicate username in import")
+            elif user_in.email in self._emails:
+                self._fail(index, user_in.username, "Duplicate email in import")
+            else:
+                self._usernames.add(user_in.username)
+                self._emails.add(user_in.email)
+                candidates.append((index, user_in))
+
+        if not candidates:
+            return
+
+        # Usernames and emails are unique across tenants, and so across shards
+        usernames = {user_in.username for _, user_in in candidates}
+        emails = {user_in.email for _, user_in in candidates}
+        taken_usernames = set(await tenant_router.scatter(
+            select(User.username).where(User.username.in_(usernames))
+        ))
+        taken_emails = set(await tenant_router.scatter(
+            select(User.email).where(User.email.in_(emails))
+        ))
+
+        accepted: List[Tuple[int, UserCreate]] = []
+        for index, user_in in candidates:
+            if user_in.username in taken_usernames:
+                self._fail(index, user_in.username, "Username already registered")
+            elif user_in.email in taken_emails:
+                self._fail(index, user_in.username, "Email already registered")
+            else:
+                accepted.append((index, user_in))
+
+        if not accepted:
+            return
+
+        hashes = await asyncio.gather(
+            *(password_hasher.hash(user_in.password) for _, user_in in accepted)
+        )
+
+        now = datetime.utcnow()
+        values = [
+            {
+                **user_in.dict(exclude={"password", "tenant"}),
+                "tenant": self.tenant,
+                "hashed_password": hashed_password,
+                "role_mask": ROLE_USER,
+                "token_version": 0,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for (_, user_in), hashed_password in zip(accepted, hashes)
+        ]
+
+        try:
+            await self.db.execute(insert(User.__table__), values)
+            await bump_tenant_version(self.db, self.tenant)
+            await self.db.commit()
+        except IntegrityError:
+            # A concurrent writer claimed some values; find them row by row
+            await self.db.rollback()
+            await self._insert_one_by_one(accepted, values)
+            return
+
+        await self._record_created(accepted)
+
+    async def _insert_one_by_one(
+            self, accepted: List[Tuple[int, UserCreate]], values: List[Dict[str, Any]]
+    ) -> None:
+        inserted: List[Tuple[int, UserCreate]] = []
+        for (index, user_in), row in zip(accepted, values):
+            try:
+                await self.db.execute(insert(User.__table__), row)
+                await bump_tenant_version(self.db, self.tenant)
+                await self.db.commit()
+                inserted.append((index, user_in))
+            except IntegrityError:
+                await self.db.rollback()
+                self._fail(index, user_in.username, "Username or email already registered")
+
+        await self._record_created(inserted)
+
+    async def _record_created(self, inserted: List[Tuple[int, UserCreate]]) -> None:
+        if not inserted:
+            return
+
+        ids = dict((await self.db.exec(
+            select(User.username, User.id)
+            .where(User.username.in_([user_in.username for _, user_in in inserted]))
+        )).all())
+        for index, user_in in inserted:
+            self.results.append(BulkUserResult(
+                index=index,
+                status="created",
+                username=user_in.username,
+                id=ids.get(user_in.username),
+            ))
+
+    def _fail(self, index: int, username: Any, error: str) -> None:
+        self.results.append(BulkUserResult(
+            index=index,
+            status="error",
+            username=username if isinstance(username, str) else None,
+            error=error,
+        ))
@@ -0,0 +1,143 @@
+"""
+Signing key admin tool
+
+    python -m backend.app.tools.keys list [--keys-file FILE]
+    python -m backend.app.tools.keys generate KID [--algorithm RS256] [--activates-at TIME] [--retires-at TIME]
+    python -m backend.app.tools.keys retire KID [--at TIME]
+
+A rotation generates the next key with `--activates-at` at least
+JWT_KEY_PREPUBLISH_SECONDS in the future, so verifiers fetch it before it
+signs anything, and retires the current key at the same time. Private keys
+are written next to the keys file, HS secrets into it; both are readable by
+the owner only. Running services pick the changes up without a restart.
+"""
+import argparse
+import json
+import os
+import secrets
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+from backend.app.core.config import settings
+from backend.app.core.keys import ASYMMETRIC_ALGORITHMS, SYMMETRIC_ALGORITHMS, load_key
+
+# Curves of the ES algorithms
+EC_CURVES = {"ES256": ec.SECP256R1, "ES384": ec.SECP384R1, "ES512": ec.SECP521R1}
+
+
+def _read(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {"keys": []}
+    return json.loads(path.read_text())
+
+
+def _write(path: Path, data: Dict[str, Any]) -> None:
+    # Replace atomically so a running service never reads a partial file
+    temporary = path.with_suffix(".tmp")
+    fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as handle:
+        handle.write(json.dumps(data, indent=2) + "\n")
+    os.replace(temporary, path)
+
+
+def _time(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _private_key_pem(algorithm: str) -> bytes:
+    if algorithm.startswith("RS"):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        private_key = ec.generate_private_key(EC_CURVES[algorithm]())
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def list_keys(path: Path) -> None:
+    now = datetime.now(timezone.utc)
+    for entry in _read(path)["keys"]:
+        key = load_key(entry, path.parent)
+        state = "signing" if key.signs_at(now) else (
+            "pending" if key.activates_at and now < key.activates_at else "retired"
+        )
+        print(f"{key.kid}\t{key.algorithm}\t{state}\t{entry.get('activates_at', '-')}\t{entry.get('retires_at', '-')}")
+
+
+def generate(path: Path, kid: str, algorithm: str, activates_at: Optional[str], retires_at: Optional[str]) -> None:
+    data = _read(path)
+    if any(entry["kid"] == kid for entry in data["keys"]):
+        raise SystemExit(f"Key {kid} already exists")
+
+    if algorithm in SYMMETRIC_ALGORITHMS:
+        entry = {"kid": kid, "algorithm": algorithm, "secret": secrets.token_urlsafe(64)}
+        location = path
+    else:
+        location = path.parent / f"{kid}.pem"
+        fd = os.open(location, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(_private_key_pem(algorithm))
+        entry = {"kid": kid, "algorithm": algorithm, "private_key_file": location.name}
+
+    if activates_at:
+        entry["activates_at"] = _time(activates_at)
+    if retires_at:
+        entry["retires_at"] = _time(retires_at)
+    data["keys"].append(entry)
+    _write(path, data)
+    print(f"Added {algorithm} key {kid} ({location})")
+
+
+def retire(path: Path, kid: str, at: Optional[str]) -> None:
+    data = _read(path)
+    for entry in data["keys"]:
+        if entry["kid"] == kid:
+            entry["retires_at"] = _time(at) or _time(datetime.now(timezone.utc).isoformat())
+            _write(path, data)
+            print(f"Key {kid} retires at {entry['retires_at']}")
+            return
+    raise SystemExit(f"No key {kid}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage JWT signing keys")
+    parser.add_argument(
+        "--keys-file", default=settings.JWT_KEYS_FILE, help="Keys file (default: JWT_KEYS_FILE)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show every key and whether it signs now")
+    generate_parser = commands.add_parser("generate", help="Create a key and schedule it")
+    generate_parser.add_argument("kid")
+    generate_parser.add_argument("--algorithm", default="RS256", choices=ASYMMETRIC_ALGORITHMS + SYMMETRIC_ALGORITHMS)
+    generate_parser.add_argument("--activates-at", help="ISO time the key starts signing (default: now)")
+    generate_parser.add_argument("--retires-at", help="ISO time the key stops signing")
+    retire_parser = commands.add_parser("retire", help="Schedule a key to stop signing")
+    retire_parser.add_argument("kid")
+    retire_parser.add_argument("--at", help="ISO time (default: now)")
+    args = parser.parse_args()
+
+    if not args.keys_file:
+        parser.error("--keys-file or JWT_KEYS_FILE is required")
+    path = Path(args.keys_file)
+
+    if args.command == "list":
+        list_keys(path)
+    elif args.command == "generate":
+        generate(path, args.kid, args.algorithm, args.activates_at, args.retires_at)
+    else:
+        retire(path, args.kid, args.at)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Tenant placement admin tool
+
+    python -m backend.app.tools.tenants list
+    python -m backend.app.tools.tenants move TENANT SHARD [--settle SECONDS]
+
+Moves wait for running workers to reload placements (TENANT_PLACEMENT_REFRESH_SECONDS)
+before copying and again before deleting; pass `--settle 0` when the API is stopped.
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+from backend.app.core.config import settings
+from backend.app.db.database import tenant_router
+from backend.app.services.principal_cache import principal_cache
+from backend.app.services.tenant_move import TenantMover
+
+
+async def list_placements() -> None:
+    await tenant_router.seed_placements()
+    await tenant_router.load_placements()
+    for tenant, (shard, moving) in sorted(tenant_router.placements().items()):
+        print(f"{tenant}\t{shard}{' (moving)' if moving else ''}")
+
+
+async def move(tenant: str, shard: str, settle_seconds: float) -> None:
+    mover = TenantMover(tenant_router, settle_seconds)
+    print(json.dumps(await mover.move(tenant, shard)))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage tenant shard placements")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show the shard of every placed tenant")
+    move_parser = commands.add_parser("move", help="Move a tenant to another shard")
+    move_parser.add_argument("tenant")
+    move_parser.add_argument("shard")
+    move_parser.add_argument(
+        "--settle",
+        type=float,
+        default=settings.TENANT_PLACEMENT_REFRESH_SECONDS + 1,
+        help="Seconds to wait for workers to notice placement changes",
+    )
+    args = parser.parse_args()
+
+    try:
+        if args.command == "list":
+            await list_placements()
+        else:
+            await move(args.tenant, args.shard, args.settle)
+    finally:
+        await principal_cache.stop()
+        await tenant_router.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
+    asyncio.run(main())
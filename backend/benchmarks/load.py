@@ -0,0 +1,169 @@
+"""
+Load scenarios driven through the ASGI app with httpx
+
+Every scenario runs `concurrency` clients as asyncio tasks against the same
+in-process app, so results reflect the service itself (event loop, hashing
+pool, database) rather than a network or HTTP server.
+"""
+import asyncio
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import httpx
+
+from backend.benchmarks.seed import SeededTenant
+
+API = "/api/v1"
+
+
+class Recorder:
+    """
+    Latencies and failures of one scenario
+    """
+
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.started = time.perf_counter()
+
+    async def call(self, request: Awaitable[httpx.Response], expected: int = 200) -> httpx.Response:
+        start = time.perf_counter()
+        response = await request
+        self.latencies.append(time.perf_counter() - start)
+        if response.status_code != expected:
+            self.errors += 1
+        return response
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        ordered = sorted(self.latencies)
+
+        def percentile(fraction: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+        return {
+            "requests": len(ordered),
+            "errors": self.errors,
+            "seconds": elapsed,
+            "rps": len(ordered) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+        }
+
+
+async def _clients(concurrency: int, client: Callable[[int], Awaitable[None]]) -> None:
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+
+
+async def _login(http: httpx.AsyncClient, seeded: SeededTenant, username: str) -> Dict[str, Any]:
+    response = await http.post(f"{API}/auth/login", json={
+        "username": username, "password": seeded.password, "tenant": seeded.tenant,
+    })
+    response.raise_for_status()
+    return response.json()
+
+
+async def login_storm(
+        http: httpx.AsyncClient, seeded: SeededTenant, concurrency: int, requests: int,
+) -> Dict[str, Any]:
+    """
+    Many different users logging in at once; bound by bcrypt and the hashing pool
+    """
+    usernames = itertools.cycle(seeded.usernames)
+    per_client = max(requests // concurrency, 1)
+    recorder = Recorder()
+
+    async def client(_: int) -> None:
+        for _ in range(per_client):
+            await recorder.call(http.post(f"{API}/auth/login", json={
+                "username": next(usernames), "password": seeded.password, "tenant": seeded.tenant,
+            }))
+
+    await _clients(concurrency, client)
+    return recorder.summary()
+
+
+async def refresh_churn(
+        http: httpx.AsyncClient, seeded: SeededTenant, concurrency: int, requests: int,
+) -> Dict[str, Any]:
+    """
+    Clients rotating their refresh token over and over
+    """
+    sessions = [await _login(http, seeded, seeded.usernames[index]) for index in range(concurrency)]
+    per_client = max(requests // concurrency, 1)
+    recorder = Recorder()
+
+    async def client(index: int) -> None:
+        refresh_token = sessions[index]["refresh_token"]
+        for _ in range(per_client):
+            response = await recorder.call(
+                http.post(f"{API}/auth/refresh", json={"refresh_token": refresh_token})
+            )
+            if response.status_code != 200:
+                return
+            refresh_token = response.json()["refresh_token"]
+
+    await _clients(concurrency, client)
+    return recorder.summary()
+
+
+async def me_steady(
+        http: httpx.AsyncClient, seeded: SeededTenant, concurrency: int, requests: int,
+) -> Dict[str, Any]:
+    """
+    Authenticated clients polling /auth/me with valid access tokens
+    """
+    sessions = [await _login(http, seeded, seeded.usernames[index]) for index in range(concurrency)]
+    per_client = max(requests // concurrency, 1)
+    recorder = Recorder()
+
+    async def client(index: int) -> None:
+        headers = {"Authorization": f"Bearer {sessions[index]['access_token']}"}
+        for _ in range(per_client):
+            await recorder.call(http.get(f"{API}/auth/me", headers=headers))
+
+    await _clients(concurrency, client)
+    return recorder.summary()
+
+
+async def users_pagination(
+        http: httpx.AsyncClient, seeded: SeededTenant, concurrency: int, requests: int,
+) -> Dict[str, Any]:
+    """
+    Admins walking the tenant's user list page by page; `requests` caps the pages per client
+    """
+    session = await _login(http, seeded, seeded.admin_username)
+    headers = {"Authorization": f"Bearer {session['access_token']}"}
+    recorder = Recorder()
+    rows: List[int] = []
+
+    async def client(_: int) -> None:
+        params: Dict[str, Any] = {"limit": 100}
+        seen = 0
+        for _ in range(requests):
+            response = await recorder.call(http.get(f"{API}/users/", headers=headers, params=params))
+            if response.status_code != 200:
+                return
+            page = response.json()
+            seen += len(page["items"])
+            if not page["next_cursor"]:
+                break
+            params["cursor"] = page["next_cursor"]
+        rows.append(seen)
+
+    await _clients(concurrency, client)
+    return {**recorder.summary(), "rows_per_client": max(rows, default=0)}
+
+
+# name -> (scenario, default concurrency, default requests)
+SCENARIOS: Dict[str, Tuple[Callable[..., Awaitable[Dict[str, Any]]], int, int]] = {
+    "login_storm": (login_storm, 16, 64),
+    "refresh_churn": (refresh_churn, 16, 800),
+    "me_steady": (me_steady, 32, 6400),
+    "users_pagination": (users_pagination, 4, 1000),
+}
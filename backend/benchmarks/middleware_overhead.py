@@ -0,0 +1,119 @@
+"""
+Per-request overhead of TokenRefreshMiddleware
+
+Compares a bare endpoint, the previous BaseHTTPMiddleware implementation and
+the current pure ASGI middleware by driving the ASGI callables directly, so
+the numbers exclude any HTTP client or server cost.
+
+    python -m backend.benchmarks.middleware_overhead [--requests 20000]
+"""
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+
+from jose import jwt
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from backend.app.core.roles import ROLE_USER
+from backend.app.core.security import create_access_token, key_ring
+from backend.app.middlewares.token_middleware import TokenRefreshMiddleware
+
+
+class LegacyTokenRefreshMiddleware(BaseHTTPMiddleware):
+    """
+    The BaseHTTPMiddleware version, limited to the path taken by tokens that
+    are not close to expiry
+    """
+
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return response
+
+        token = auth_header.replace("Bearer ", "")
+        signing_key = key_ring.signing_key()
+        jwt.decode(token, signing_key.verifier, algorithms=[signing_key.algorithm])
+        return response
+
+
+async def endpoint(request):
+    return PlainTextResponse("ok")
+
+
+def build_app(middleware=None):
+    app = Starlette(routes=[Route("/ping", endpoint)])
+    return middleware(app) if middleware else app
+
+
+async def run(app, token: str, requests: int) -> float:
+    """
+    Return the mean time per request in microseconds
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+    }
+
+    received = False
+
+    async def receive():
+        # After the body a server blocks until the client disconnects
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Warm up caches before timing
+    for _ in range(100):
+        received = False
+        await app(dict(scope), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        received = False
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+async def main(requests: int) -> None:
+    token = create_access_token(
+        "1", "bench", "default", ROLE_USER, expires_delta=timedelta(hours=1)
+    )
+    variants = {
+        "no middleware": build_app(),
+        "BaseHTTPMiddleware (before)": build_app(LegacyTokenRefreshMiddleware),
+        "pure ASGI (after)": build_app(TokenRefreshMiddleware),
+    }
+
+    baseline = None
+    for name, app in variants.items():
+        per_request = await run(app, token, requests)
+        baseline = per_request if baseline is None else baseline
+        print(f"{name:30} {per_request:8.1f} us/request  (+{per_request - baseline:.1f} us)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,178 @@
+"""
+Benchmark suite for the auth service
+
+Runs the load scenarios against a freshly seeded SQLite database and the
+micro-benchmarks, writes the results as JSON and, given a baseline from an
+earlier run, fails when a result regressed by more than its threshold
+(thresholds.json: allowed relative slowdown per result, or "default").
+
+    python -m backend.benchmarks.run --output results.json
+    python -m backend.benchmarks.run --baseline results.json --only me_steady micro
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+THRESHOLDS_FILE = Path(__file__).with_name("thresholds.json")
+
+# Metrics compared against the baseline: name -> True when higher is better
+COMPARED_METRICS = {"p95_ms": False, "rps": True, "us_per_op": False}
+
+
+def prepare_environment(database_dir: str) -> None:
+    """
+    Point the app at a scratch database; settings are read at import time
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(database_dir, 'bench.db')}"
+    # Background jobs and per-statement logging would distort the numbers
+    os.environ.setdefault("REFRESH_TOKEN_PURGE_INTERVAL_SECONDS", "0")
+    os.environ.setdefault("DATABASE_SLOW_QUERY_MS", "0")
+    os.environ.setdefault("DATABASE_REPEATED_QUERY_THRESHOLD", "0")
+    # Every simulated client shares one address and would be throttled
+    os.environ.setdefault("LOGIN_THROTTLE_ENABLED", "false")
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_load(args: argparse.Namespace, names: List[str]) -> Dict[str, Dict[str, Any]]:
+    import httpx
+
+    from backend.app.main import app
+    from backend.benchmarks.load import SCENARIOS
+    from backend.benchmarks.seed import seed_tenant
+
+    results: Dict[str, Dict[str, Any]] = {}
+    async with app.router.lifespan_context(app):
+        logging.getLogger().setLevel(logging.WARNING)
+
+        started = time.perf_counter()
+        seeded = await seed_tenant("bench", args.users)
+        print(f"seeded {args.users} users in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as http:
+            for name in names:
+                scenario, concurrency, requests = SCENARIOS[name]
+                concurrency = args.concurrency or concurrency
+                requests = max(int(requests * args.scale), concurrency)
+                results[name] = await scenario(http, seeded, concurrency, requests)
+                results[name]["concurrency"] = concurrency
+                print(_describe(name, results[name]), file=sys.stderr)
+    return results
+
+
+def _describe(name: str, result: Dict[str, Any]) -> str:
+    if "us_per_op" in result:
+        return f"{name:32} {result['us_per_op']:12.1f} us/op"
+    return (
+        f"{name:32} {result['rps']:9.1f} req/s  p50 {result['p50_ms']:7.2f} ms  "
+        f"p95 {result['p95_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  errors {result['errors']}"
+    )
+
+
+def compare(
+        results: Dict[str, Dict[str, Any]],
+        baseline: Dict[str, Dict[str, Any]],
+        thresholds: Dict[str, float],
+) -> List[str]:
+    """
+    Describe every result that failed or got slower than its threshold allows
+    """
+    failures = []
+    for name, result in results.items():
+        if result.get("errors"):
+            failures.append(f"{name}: {result['errors']} failed requests")
+
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        tolerance = thresholds.get(name, thresholds.get("default", 0.25))
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in result or not previous.get(metric):
+                continue
+            change = (result[metric] - previous[metric]) / previous[metric]
+            if higher_is_better:
+                change = -change
+            if change > tolerance:
+                failures.append(
+                    f"{name}: {metric} {previous[metric]:.2f} -> {result[metric]:.2f} "
+                    f"({change:+.0%}, threshold {tolerance:.0%})"
+                )
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Auth service benchmark suite")
+    parser.add_argument(
+        "--only", nargs="+", metavar="NAME",
+        help="Scenarios to run (login_storm, refresh_churn, me_steady, users_pagination, micro)",
+    )
+    parser.add_argument("--users", type=int, default=100000, help="Users seeded into the bench tenant")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for requests and calls")
+    parser.add_argument("--concurrency", type=int, help="Clients per scenario, overriding the defaults")
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the results")
+    parser.add_argument("--baseline", help="Earlier results to check for regressions")
+    parser.add_argument("--db-dir", help="Directory for the scratch database (default: a temp dir)")
+    args = parser.parse_args()
+
+    database_dir = args.db_dir or tempfile.mkdtemp(prefix="auth-bench-")
+    prepare_environment(database_dir)
+    if os.path.exists(os.path.join(database_dir, "bench.db")):
+        parser.error(f"{database_dir} already holds a bench.db; results need a fresh database")
+
+    from backend.benchmarks.load import SCENARIOS
+    from backend.benchmarks.micro import run_micro
+
+    selected = args.only or [*SCENARIOS, "micro"]
+    unknown = set(selected) - set(SCENARIOS) - {"micro"}
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    load_names = [name for name in selected if name in SCENARIOS]
+    if load_names:
+        results.update(asyncio.run(run_load(args, load_names)))
+    if "micro" in selected:
+        for name, result in run_micro(args.scale).items():
+            results[f"micro.{name}"] = result
+            print(_describe(f"micro.{name}", result), file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "users": args.users,
+            "scale": args.scale,
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"results written to {args.output}", file=sys.stderr)
+
+    baseline = json.loads(Path(args.baseline).read_text())["results"] if args.baseline else {}
+    failures = compare(results, baseline, json.loads(THRESHOLDS_FILE.read_text()))
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
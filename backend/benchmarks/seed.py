@@ -0,0 +1,65 @@
+"""
+Fast seeding of benchmark tenants
+
+Users are inserted with Core `executemany` in large chunks and share one
+password hash, so 100k users take seconds instead of the hours bcrypt
+would need to hash every password.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+
+from backend.app.core.roles import ROLE_ADMIN, ROLE_USER
+from backend.app.core.security import get_password_hash
+from backend.app.db.database import tenant_router
+from backend.app.models.user import User
+
+# Rows per executemany call
+SEED_CHUNK_SIZE = 10000
+
+# Password of every seeded user
+PASSWORD = "bench-password"
+
+
+@dataclass
+class SeededTenant:
+    tenant: str
+    admin_username: str
+    usernames: List[str]
+    password: str = PASSWORD
+
+
+def _rows(tenant: str, count: int, hashed_password: str) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    return [
+        {
+            "username": f"{tenant}-user{index:06d}",
+            "email": f"user{index:06d}@{tenant}.bench.example",
+            "full_name": f"Bench User {index}",
+            "disabled": False,
+            "tenant": tenant,
+            "hashed_password": hashed_password,
+            # The first user administers the tenant
+            "role_mask": ROLE_ADMIN | ROLE_USER if index == 0 else ROLE_USER,
+            "token_version": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for index in range(count)
+    ]
+
+
+async def seed_tenant(tenant: str, count: int) -> SeededTenant:
+    """
+    Insert `count` users into a tenant that has none yet
+    """
+    rows = _rows(tenant, count, get_password_hash(PASSWORD))
+    shard = await tenant_router.shard_for(tenant)
+    async with shard.engine.begin() as conn:
+        for start in range(0, len(rows), SEED_CHUNK_SIZE):
+            await conn.execute(insert(User.__table__), rows[start:start + SEED_CHUNK_SIZE])
+
+    usernames = [row["username"] for row in rows]
+    return SeededTenant(tenant=tenant, admin_username=usernames[0], usernames=usernames)
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# Settings are read when the app is first imported, so the test environment
+# is set up before any test module imports it
+_data_dir = tempfile.mkdtemp(prefix="project-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_data_dir}/test.db"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
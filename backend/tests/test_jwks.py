@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+
+client = TestClient(app)
+
+
+def _etag() -> str:
+    response = client.get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    return response.headers["etag"]
+
+
+@pytest.mark.parametrize("if_none_match", [
+    "{etag}",
+    "W/{etag}",
+    '"other", {etag}',
+    "*",
+])
+def test_matching_if_none_match_is_not_modified(if_none_match):
+    etag = _etag()
+
+    response = client.get("/.well-known/jwks.json", headers={"If-None-Match": if_none_match.format(etag=etag)})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.headers["cache-control"].startswith("public, max-age=")
+
+
+def test_other_etags_get_the_key_set():
+    _etag()
+
+    response = client.get("/.well-known/jwks.json", headers={"If-None-Match": '"other"'})
+
+    assert response.status_code == 200
+    assert "keys" in response.json()
@@ -0,0 +1,151 @@
+"""
+Conformance of the fast HMAC codec with python-jose
+
+It must produce byte-identical tokens and accept and reject exactly the
+tokens python-jose does, with the same claims.
+"""
+import base64
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pytest
+from jose import JWTError, jwk, jwt
+
+from backend.app.core.token_codec import HMACCodec, JoseCodec, create_codec
+
+SECRET = "conformance-secret-that-is-long-enough"
+OTHER_SECRET = "some-other-secret"
+
+ALGORITHMS = ("HS256", "HS384", "HS512")
+HEADERS = ({}, {"kid": "2024-01"})
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _raw_token(header: Dict[str, Any], payload: Any, secret: str = SECRET, algorithm: str = "HS256") -> str:
+    """
+    A token with arbitrary header and payload, signed like any other
+    """
+    signing_input = f"{_b64(json.dumps(header).encode())}.{_b64(json.dumps(payload).encode())}"
+    signature = jwk.construct(secret, algorithm).sign(signing_input.encode())
+    return f"{signing_input}.{_b64(signature)}"
+
+
+def _codecs(algorithm: str, headers: Dict[str, Any]) -> Tuple[HMACCodec, JoseCodec]:
+    key = jwk.construct(SECRET, algorithm)
+    return HMACCodec(algorithm, key, key, headers), JoseCodec(algorithm, key, key, headers)
+
+
+def claim_sets() -> Dict[str, Dict[str, Any]]:
+    now = int(time.time())
+    return {
+        "access token": {"sub": "1", "username": "alice", "tid": "default", "rm": 1, "ver": 0, "exp": now + 600, "iat": now},
+        "datetime claims": {"sub": "2", "exp": datetime.utcnow() + timedelta(minutes=5), "iat": datetime.utcnow()},
+        "non-ascii": {"sub": "3", "username": "jürgen ☃", "tid": "acme:eu", "exp": now + 60},
+        "nested": {"sub": "4", "nested": {"b": [1, 2.5, None, True]}, "exp": now + 60},
+        "no exp": {"sub": "5"},
+    }
+
+
+def _cases(codec: HMACCodec) -> Dict[str, Callable[[], str]]:
+    """
+    Tokens both implementations must agree on, built on demand
+    """
+    now = int(time.time())
+    algorithm = codec.algorithm
+    header = {"alg": algorithm, "typ": "JWT", **codec.headers}
+    valid = codec.encode({"sub": "1", "exp": now + 600, "iat": now})
+    head, payload, signature = valid.split(".")
+    other_key = jwk.construct(OTHER_SECRET, algorithm)
+    tampered = _b64(json.dumps({"sub": "2"}).encode())
+
+    def non_json_payload() -> str:
+        signing_input = f"{head}.{_b64(b'not json')}"
+        return f"{signing_input}.{_b64(jwk.construct(SECRET, algorithm).sign(signing_input.encode()))}"
+
+    return {
+        "valid": lambda: valid,
+        "expired": lambda: codec.encode({"sub": "1", "exp": now - 10}),
+        "expired a second ago": lambda: codec.encode({"sub": "1", "exp": now - 1}),
+        "expires this second": lambda: codec.encode({"sub": "1", "exp": now}),
+        "not yet valid": lambda: codec.encode({"sub": "1", "nbf": now + 600}),
+        "valid nbf": lambda: codec.encode({"sub": "1", "nbf": now - 1}),
+        "string exp": lambda: codec.encode({"sub": "1", "exp": str(now + 600)}),
+        "non-numeric iat": lambda: codec.encode({"sub": "1", "iat": "yesterday"}),
+        "integer sub": lambda: codec.encode({"sub": 1}),
+        "audience": lambda: codec.encode({"sub": "1", "aud": "gateway"}),
+        "jti": lambda: codec.encode({"sub": "1", "jti": 5}),
+        "other key": lambda: HMACCodec(algorithm, other_key, other_key, codec.headers).encode({"sub": "1"}),
+        "tampered payload": lambda: f"{head}.{tampered}.{signature}",
+        "tampered signature": lambda: f"{head}.{payload}.{signature[:-2]}AA",
+        "padded signature": lambda: f"{head}.{payload}.{signature}==",
+        "truncated signature": lambda: f"{head}.{payload}.{signature[:-5]}",
+        "empty signature": lambda: f"{head}.{payload}.",
+        "two segments": lambda: f"{head}.{payload}",
+        "four segments": lambda: f"{head}.{payload}.{signature}.{signature}",
+        "empty": lambda: "",
+        "garbage": lambda: "not-a-token",
+        "alg none": lambda: f"{_b64(json.dumps({'alg': 'none', 'typ': 'JWT'}).encode())}.{payload}.",
+        "other algorithm": lambda: _raw_token({**header, "alg": "HS512" if algorithm != "HS512" else "HS256"},
+                                              {"sub": "1"}, algorithm="HS512" if algorithm != "HS512" else "HS256"),
+        "reordered header": lambda: _raw_token(dict(reversed(list(header.items()))), {"sub": "1"}, algorithm=algorithm),
+        "array payload": lambda: _raw_token(header, [1, 2], algorithm=algorithm),
+        "spaced payload": lambda: _raw_token(header, {"sub": "1", "exp": now + 60}, algorithm=algorithm),
+        "non-json payload": non_json_payload,
+    }
+
+
+CASES = list(_cases(_codecs("HS256", {})[0]))
+CONFIGURATIONS = [
+    pytest.param(algorithm, headers, id=f"{algorithm}{'-kid' if headers else ''}")
+    for algorithm in ALGORITHMS
+    for headers in HEADERS
+]
+
+
+def _outcome(decode: Callable[[str], Dict[str, Any]], token: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    try:
+        return "accepted", decode(token)
+    except JWTError:
+        return "rejected", None
+
+
+@pytest.mark.parametrize("algorithm,headers", CONFIGURATIONS)
+@pytest.mark.parametrize("claims", list(claim_sets()))
+def test_encode_matches_python_jose(algorithm, headers, claims):
+    fast, _ = _codecs(algorithm, headers)
+    claim_set = claim_sets()[claims]
+
+    expected = jwt.encode(dict(claim_set), SECRET, algorithm=algorithm, headers=headers or None)
+
+    assert fast.encode(claim_set) == expected
+
+
+@pytest.mark.parametrize("algorithm,headers", CONFIGURATIONS)
+@pytest.mark.parametrize("case", CASES)
+def test_decode_matches_python_jose(algorithm, headers, case):
+    fast, reference = _codecs(algorithm, headers)
+    token = _cases(fast)[case]()
+
+    assert _outcome(fast.decode, token) == _outcome(reference.decode, token)
+
+
+def test_valid_tokens_round_trip():
+    fast, _ = _codecs("HS256", {"kid": "2024-01"})
+    claims = claim_sets()["access token"]
+
+    assert fast.decode(fast.encode(claims)) == claims
+    assert jwt.get_unverified_header(fast.encode(claims)) == {"alg": "HS256", "kid": "2024-01", "typ": "JWT"}
+
+
+def test_create_codec_picks_the_backend():
+    key = jwk.construct(SECRET, "HS256")
+
+    assert isinstance(create_codec("HS256", key, key, {}, "fast"), HMACCodec)
+    assert type(create_codec("HS256", key, key, {}, "jose")) is JoseCodec
+    with pytest.raises(ValueError):
+        create_codec("HS256", key, key, {}, "other")
@@ -0,0 +1,40 @@
+import logging
+
+import pytest
+
+from backend.app.middlewares.token_middleware import TokenRefreshMiddleware
+
+
+async def _app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _call(path: str, authorization: bytes) -> list:
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "path": path, "headers": [(b"authorization", b"Bearer " + authorization)]}
+    await TokenRefreshMiddleware(_app)(scope, None, send)
+    return messages
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/api/v1/auth/introspect", "/api/v1/users/me"])
+async def test_non_jwt_bearer_values_are_not_errors(path, caplog):
+    with caplog.at_level(logging.DEBUG, logger="backend.app.middlewares.token_middleware"):
+        messages = await _call(path, b"gateway-client-secret")
+
+    assert messages[0]["status"] == 200
+    assert all(b"x-new-access-token" not in name for name, _ in messages[0]["headers"])
+    assert not [record for record in caplog.records if record.levelno >= logging.WARNING]
+
+
+@pytest.mark.asyncio
+async def test_introspection_skips_token_refresh(caplog):
+    with caplog.at_level(logging.DEBUG, logger="backend.app.middlewares.token_middleware"):
+        await _call("/api/v1/auth/introspect", b"gateway-client-secret")
+
+    assert not caplog.records
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete
+from sqlmodel import SQLModel, select
+
+from backend.app.db.database import async_session, engine
+from backend.app.models.token import RefreshToken
+from backend.app.services.token_purge import RefreshTokenPurger
+
+
+@pytest.mark.asyncio
+async def test_disabled_purger_is_not_scheduled():
+    purger = RefreshTokenPurger(interval_seconds=60, batch_size=10, batch_pause_seconds=0, enabled=False)
+
+    purger.start(engine)
+
+    assert purger._task is None
+    assert purger.stats()["enabled"] is False
+
+
+@pytest.mark.asyncio
+async def test_purge_deletes_expired_and_revoked_tokens():
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all, tables=[RefreshToken.__table__])
+        await conn.execute(delete(RefreshToken))
+    now = datetime.utcnow()
+    async with async_session() as db:
+        for index, (expires_at, revoked) in enumerate([
+            (now + timedelta(days=1), False),
+            (now - timedelta(seconds=1), False),
+            (now + timedelta(days=1), True),
+        ]):
+            db.add(RefreshToken(token_hash=f"{index}" * 64, user_id=index, token_version=0,
+                                expires_at=expires_at, revoked=revoked))
+        await db.commit()
+
+    purger = RefreshTokenPurger(interval_seconds=60, batch_size=1, batch_pause_seconds=0)
+
+    assert await purger.purge(engine) == 2
+    async with async_session() as db:
+        assert [token.user_id for token in (await db.exec(select(RefreshToken))).all()] == [0]
@@ -0,0 +1,148 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from fakeredis import aioredis
+from sqlalchemy import delete
+from sqlmodel import SQLModel
+
+from backend.app.db.database import engine
+from backend.app.models.token import RefreshToken
+from backend.app.providers.token_store import (
+    MemoryTokenStore,
+    RedisTokenStore,
+    SQLTokenStore,
+    TokenStore,
+)
+
+LIFETIME = timedelta(days=7)
+
+
+@pytest_asyncio.fixture(params=["sql", "memory", "redis"])
+async def store(request) -> TokenStore:
+    if request.param == "sql":
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all, tables=[RefreshToken.__table__])
+            await conn.execute(delete(RefreshToken))
+        token_store: TokenStore = SQLTokenStore()
+    elif request.param == "memory":
+        token_store = MemoryTokenStore()
+    else:
+        token_store = RedisTokenStore(aioredis.FakeRedis())
+    yield token_store
+    await token_store.close()
+
+
+async def save(store: TokenStore, token_hash: str, user_id: int = 1, tenant: str = "default",
+               lifetime: timedelta = LIFETIME, version: int = 0) -> datetime:
+    expires_at = datetime.utcnow() + lifetime
+    await store.save(token_hash, user_id, version, expires_at, tenant)
+    return expires_at
+
+
+@pytest.mark.asyncio
+async def test_consume_returns_the_issued_token(store):
+    expires_at = await save(store, "a" * 64, user_id=7, tenant="acme:eu", version=3)
+
+    token = await store.consume("a" * 64)
+
+    assert (token.user_id, token.token_version, token.tenant) == (7, 3, "acme:eu")
+    # Redis keeps whole seconds
+    assert abs(token.expires_at - expires_at) < timedelta(seconds=1)
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_consumed_once(store):
+    await save(store, "b" * 64)
+
+    assert await store.consume("b" * 64) is not None
+    assert await store.consume("b" * 64) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_consumes_succeed_once(store):
+    await save(store, "c" * 64)
+
+    results = await asyncio.gather(*(store.consume("c" * 64) for _ in range(5)))
+
+    assert sum(result is not None for result in results) == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_tokens(store):
+    assert await store.consume("0" * 64) is None
+    assert await store.revoke("0" * 64, "default", 1) is False
+
+
+@pytest.mark.asyncio
+async def test_revoke_checks_the_owner(store):
+    await save(store, "d" * 64, user_id=1)
+
+    assert await store.revoke("d" * 64, "default", 2) is False
+    assert await store.revoke("d" * 64, "default", 1) is True
+    assert await store.consume("d" * 64) is None
+
+
+@pytest.mark.asyncio
+async def test_revoke_checks_the_tenant(store):
+    # User ids are only unique within a shard
+    await save(store, "i" * 64, user_id=5, tenant="acme")
+
+    assert await store.revoke("i" * 64, "other", 5) is False
+    assert (await store.consume("i" * 64)).tenant == "acme"
+
+
+@pytest.mark.asyncio
+async def test_revoke_users_is_scoped_to_the_tenant(store):
+    await save(store, "e1" * 32, user_id=1, tenant="acme")
+    await save(store, "e2" * 32, user_id=1, tenant="acme")
+    await save(store, "e3" * 32, user_id=2, tenant="acme")
+    await save(store, "e4" * 32, user_id=3, tenant="acme")
+    await save(store, "e5" * 32, user_id=1, tenant="other")
+
+    await store.revoke_users("acme", [1, 2])
+
+    for token_hash in ("e1" * 32, "e2" * 32, "e3" * 32):
+        assert await store.consume(token_hash) is None
+    assert (await store.consume("e4" * 32)).user_id == 3
+    assert (await store.consume("e5" * 32)).tenant == "other"
+
+
+@pytest.mark.asyncio
+async def test_expired_tokens_cannot_be_used(store):
+    await save(store, "f" * 64, lifetime=timedelta(seconds=-1))
+
+    assert await store.consume("f" * 64) is None
+
+
+@pytest.mark.asyncio
+async def test_tokens_expire(store):
+    await save(store, "g1" * 32, lifetime=timedelta(seconds=1.5))
+    await save(store, "g2" * 32, lifetime=timedelta(seconds=1.5))
+
+    assert await store.consume("g1" * 32) is not None
+    await asyncio.sleep(1.6)
+    assert await store.consume("g2" * 32) is None
+
+
+@pytest.mark.asyncio
+async def test_redis_keys_expire_with_the_token():
+    client = aioredis.FakeRedis()
+    store = RedisTokenStore(client)
+    await save(store, "h" * 64, user_id=4, tenant="acme")
+
+    ttl = await client.ttl("refresh:" + "h" * 64)
+    assert LIFETIME.total_seconds() - 5 < ttl <= LIFETIME.total_seconds()
+    assert 0 < await client.ttl("refresh:user:4:acme") <= ttl
+    await store.close()
+
+
+def test_incomplete_stores_cannot_be_created():
+    class NoRevokeUsers(TokenStore):
+        save = MemoryTokenStore.save
+        consume = MemoryTokenStore.consume
+        revoke = MemoryTokenStore.revoke
+
+    with pytest.raises(TypeError, match="revoke_users"):
+        NoRevokeUsers()
@@ -26,7 +26,7 @@ export interface AuthResponse {
 export interface TokenPayload {
   sub: string; // user id
   username: string;
-  roles: string[];
+  rm: number; // role bitmask; role names come from /auth/me
   exp: number;
   iat: number;
 }